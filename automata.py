@@ -0,0 +1,580 @@
+# This file compiles the markedness constraints of CON into finite-state counters, which score a candidate in one left-to-right pass, for any word length
+# Each constraint becomes a small machine with:
+# - a start state
+# - step(state,character) -> (new state, violations assigned at this character)
+# - final(state) -> violations assigned at the right edge of the word
+# Local constraints (clash, lapse, edge windows) are counters over a sliding window of the string, padded with '<' (left edge) and '>' (right edge);
+# gradient alignment constraints count unstressed syllables or stresses with small counters, so no distance is bounded by a fixed-length lookbehind
+# The machines of a constraint set are combined into one automaton, whose transitions are built lazily and memoized:
+# after warming up, a candidate is scanned once for the whole constraint set, with one table lookup per character,
+# and the violations of all constraints are accumulated in a single integer (one 32-bit field per constraint)
+# The automaton can also score all candidates up to some length at once, extending a trie of prefixes one syllable at a time (see score_lengths)
+#
+# Usage: python automata.py [max_length] - checks the automaton against count_violations for every constraint and lengths 2-max_length
+
+import re
+import sys
+from array import array
+from constraints import *
+from representation_generator import *
+
+
+## Machines
+
+# Counts (weighted) matches of fixed-width patterns over a sliding window of the padded string
+# terms: a list of (width, regular expression matching the whole window, weight); each window is counted once per term
+class WindowCounter:
+
+    def __init__(self,terms):
+        self.terms = [(width,re.compile(pattern),weight) for width,pattern,weight in terms]
+        self.width = max([width for width,pattern,weight in terms])
+        self.start = '<'
+
+    def step(self,state,character):
+        window = state + character
+        violations = sum([weight for width,pattern,weight in self.terms if len(window) >= width and pattern.fullmatch(window[-width:])])
+        if self.width == 1:
+            return '', violations
+        return window[-(self.width-1):], violations
+
+    def final(self,state):
+        return self.step(state,'>')[1]
+
+# Counts non-overlapping matches of a fixed-width pattern, from left to right (like re.findall on a pattern without lookahead)
+# state: (last characters, number of characters since the end of the last counted match)
+class NonOverlappingCounter:
+
+    def __init__(self,width,pattern):
+        self.width = width
+        self.pattern = re.compile(pattern)
+        self.start = ('<',width)
+
+    def step(self,state,character):
+        window, gap = state
+        window = (window + character)[-self.width:]
+        gap = min(gap+1,self.width)
+        if gap >= self.width and self.pattern.fullmatch(window):
+            return (window[-(self.width-1):],0), 1
+        return (window[-(self.width-1):],gap), 0
+
+    def final(self,state):
+        return 0
+
+# Unstressed syllables before the first stress, beyond the first skipped ones
+# left_edge_only: count only if the word begins with an active edge
+class LeadingUnstressed:
+
+    def __init__(self,skipped=0,left_edge_only=False):
+        self.skipped = skipped
+        self.left_edge_only = left_edge_only
+        self.start = 'start'
+
+    def step(self,state,character):
+        if state == 'start':
+            if character == '@':
+                return 0, 0
+            if self.left_edge_only:
+                return 'done', 0
+            state = 0
+        if state == 'done' or character != 'o':
+            return 'done', 0
+        return min(state+1,self.skipped), (1 if state >= self.skipped else 0)
+
+    def final(self,state):
+        return 0
+
+# Unstressed syllables after the last stress, beyond the first skipped ones (assigned at the right edge)
+# right_edge_only: count only if the word ends with an active edge
+# state: (unstressed syllables since the last stress, whether an active edge was seen after a syllable)
+class TrailingUnstressed:
+
+    def __init__(self,skipped=0,right_edge_only=False):
+        self.skipped = skipped
+        self.right_edge_only = right_edge_only
+        self.start = (0,False)
+
+    def step(self,state,character):
+        unstressed, edge = state
+        if character == 'o':
+            return (unstressed+1,False), 0
+        if character == '@':
+            return (unstressed,True), 0
+        return (0,False), 0
+
+    def final(self,state):
+        unstressed, edge = state
+        if self.right_edge_only and not edge:
+            return 0
+        return max(0,unstressed-self.skipped)
+
+# For each stress, one violation for every syllable separating it from the left edge (AlignAll/L)
+class StressDistancesLeft:
+    start = 0
+
+    def step(self,state,character):
+        if character == '@':
+            return state, 0
+        return state+1, (state if character in 'sS' else 0)
+
+    def final(self,state):
+        return 0
+
+# For each stress, one violation for every syllable separating it from the right edge (AlignAll/R): each syllable counts the stresses before it
+class StressDistancesRight:
+    start = 0
+
+    def step(self,state,character):
+        if character == '@':
+            return state, 0
+        return state + (1 if character in 'sS' else 0), state
+
+    def final(self,state):
+        return 0
+
+# Distance of the peak from the left edge (AlignPeak_syl/L); a word without a peak is an error, as in count_violations
+# state: (syllables so far, whether the peak was seen)
+class PeakDistanceLeft:
+    start = (0,False)
+
+    def step(self,state,character):
+        syllables, peak = state
+        if character == '@' or peak:
+            return state, 0
+        if character == 'S':
+            return (syllables,True), syllables
+        return (syllables+1,False), 0
+
+    def final(self,state):
+        if not state[1]:
+            raise ValueError('substring not found')
+        return 0
+
+# Distance of the peak from the right edge (AlignPeak_syl/R)
+class PeakDistanceRight:
+    start = False
+
+    def step(self,state,character):
+        if character == 'S':
+            return True, 0
+        return state, (1 if state and character != '@' else 0)
+
+    def final(self,state):
+        if not state:
+            raise ValueError('substring not found')
+        return 0
+
+# Chooses between a left and a right machine by the active edge: the left machine if the word begins with @, otherwise the right machine,
+# in which case the word must end with @ (otherwise the error is raised, as in count_violations)
+# state: (machine, its state, whether the last character was @)
+class ActiveEdgeChoice:
+
+    def __init__(self,left,right,error):
+        self.left = left
+        self.right = right
+        self.error = error
+        self.start = None
+
+    def step(self,state,character):
+        if state == None:
+            if character == '@':
+                return ('L',self.left.start,True), 0
+            state = ('R',self.right.start,False)
+        side, substate, edge = state
+        machine = self.left if side == 'L' else self.right
+        substate, violations = machine.step(substate,character)
+        return (side,substate,character == '@'), violations
+
+    def final(self,state):
+        if state == None or (state[0] == 'R' and not state[2]):
+            raise TypeError(self.error)
+        side, substate, edge = state
+        return (self.left if side == 'L' else self.right).final(substate)
+
+# Secondary stresses before the peak (AlignPeak/L)
+# state: (stresses so far, whether the peak was seen)
+class StressesBeforePeak:
+    start = (0,False)
+
+    def step(self,state,character):
+        stresses, peak = state
+        if peak:
+            return state, 0
+        if character == 's':
+            return (stresses+1,False), 0
+        if character == 'S':
+            return (0,True), stresses
+        return state, 0
+
+    def final(self,state):
+        return 0
+
+# Secondary stresses after the peak (AlignPeak/R)
+class StressesAfterPeak:
+    start = False
+
+    def step(self,state,character):
+        if character == 'S':
+            return True, 0
+        return state, (1 if state and character == 's' else 0)
+
+    def final(self,state):
+        return 0
+
+# Secondary stresses between the peak and the active edge: after the peak if the word ends with @, otherwise before the peak (AlignPeak/AE)
+# state: (stresses before the peak (counted once the peak is seen), stresses after the peak, whether the peak was seen, whether the last character was @)
+class StressesToActiveEdge:
+    start = (0,0,False,False)
+
+    def step(self,state,character):
+        before, after, peak, edge = state
+        if character == 's':
+            if peak:
+                return (before,after+1,peak,False), 0
+            return (before+1,after,peak,False), 0
+        if character == 'S':
+            return (before,after,True,False), 0
+        return (before,after,peak,character == '@'), 0
+
+    def final(self,state):
+        before, after, peak, edge = state
+        if edge:
+            return after
+        return before if peak else 0
+
+# Categorical: is some secondary stress on the given side of the peak
+# side: 'before' (LeftMost), 'after' (RightMost), 'active edge' (PeakAE: before the peak if the word begins with @, after it if it ends with @)
+# state: (whether the word begins with @, whether a stress was seen before the peak, whether the peak was seen, whether a stress was seen after it, whether the last character was @)
+class StressBesidePeak:
+
+    def __init__(self,side):
+        self.side = side
+        self.start = None
+
+    def step(self,state,character):
+        if state == None:
+            state = (character == '@',False,False,False,False)
+        left_edge, before, peak, after, edge = state
+        if character == 's':
+            if peak:
+                after = True
+            else:
+                before = True
+        elif character == 'S':
+            peak = True
+        return (left_edge,before,peak,after,character == '@'), 0
+
+    def final(self,state):
+        left_edge, before, peak, after, edge = state
+        if self.side == 'before':
+            return int(before and peak)
+        if self.side == 'after':
+            return int(after)
+        return int((left_edge and before and peak) or (edge and after))
+
+# Categorical: no peak at all (Culminativity)
+class NoPeak:
+    start = False
+
+    def step(self,state,character):
+        return state or character == 'S', 0
+
+    def final(self,state):
+        return 0 if state else 1
+
+# Categorical: a secondary stress that is the leftmost stress, or precedes the peak ('^[^S]*s', for FirstStressLeft)
+class FirstStressSecondary:
+    start = 'before'
+
+    def step(self,state,character):
+        if state == 'before' and character == 's':
+            return 'done', 1
+        if character == 'S':
+            return 'done', 0
+        return state, 0
+
+    def final(self,state):
+        return 0
+
+# Categorical: a secondary stress not followed by the peak ('s[^S]*$', for LastStressRight)
+class LastStressSecondary:
+    start = False
+
+    def step(self,state,character):
+        if character == 's':
+            return True, 0
+        if character == 'S':
+            return False, 0
+        return state, 0
+
+    def final(self,state):
+        return int(state)
+
+# Weighted sum of machines, for constraints composed of several terms
+class Sum:
+
+    def __init__(self,machines,weights):
+        self.machines = machines
+        self.weights = weights
+        self.start = tuple([machine.start for machine in machines])
+
+    def step(self,state,character):
+        new_state = []
+        violations = 0
+        for machine, substate, weight in zip(self.machines,state,self.weights):
+            substate, cost = machine.step(substate,character)
+            new_state.append(substate)
+            violations = violations + cost*weight
+        return tuple(new_state), violations
+
+    def final(self,state):
+        return sum([machine.final(substate)*weight for machine,substate,weight in zip(self.machines,state,self.weights)])
+
+
+## Machines for the constraints in CON (and the constraints defined in count_violations)
+# In the window patterns, '<' and '>' are the edges of the word, and [^<>] is any character of the string (the '.' of the regular expressions in CON)
+
+any_character = '[^<>]'
+syllable = '[osS]'
+last_two = '(?:[sS]'+syllable+'|'+syllable+'[sS])'
+
+def window(*terms):
+    return lambda: WindowCounter(list(terms))
+
+MACHINES = {
+        # Rhythm
+        '*Clash': window((2,'[sS][sS]',1)),
+        '*Lapse': window((2,'oo',1)),
+        '*Clash-at-Peak': window((2,'sS|Ss',1)),
+        '*Lapse-not-at-Peak': window((4,'[^S<>]oo[^S<>]',1)),
+        '*Lapse-in-Trough': lambda: NonOverlappingCounter(4,'soos'),
+        '*ExtClash': window((2,'[sS][sS]',1),(3,'[sS]o[sS]',1)),
+        '*ExtLapse': window((3,'ooo',1)),
+
+        # Categorical alignment
+        'Stress/L': window((2,'<o',1)),
+        'Stress/R': window((2,'o>',1)),
+        '*Lapse/L': window((3,'<oo',1)),
+        '*Lapse/R': window((3,'oo>',1)),
+        '*ExtLapse/L': window((4,'<ooo',1)),
+        '*ExtLapse/R': window((4,'ooo>',1)),
+        'Stress/Edges': window((2,'<o',1),(2,'o>',1)),
+        'RightMost': lambda: StressBesidePeak('after'),
+        'LeftMost': lambda: StressBesidePeak('before'),
+
+        # Gradient alignment
+        'AlignAll/L': lambda: StressDistancesLeft(),
+        'AlignAll/R': lambda: StressDistancesRight(),
+        'Align/L': lambda: LeadingUnstressed(),
+        'Align/R': lambda: TrailingUnstressed(),
+        'Align/Edges': lambda: Sum([LeadingUnstressed(),TrailingUnstressed()],[1,1]),
+        'AlignPeak/L': lambda: StressesBeforePeak(),
+        'AlignPeak/R': lambda: StressesAfterPeak(),
+        'AlignPeak_syl/L': lambda: PeakDistanceLeft(),
+        'AlignPeak_syl/R': lambda: PeakDistanceRight(),
+
+        # Stress repulsion
+        'NonInit': window((2,'<[sS]',1)),
+        'ExtNonInit': window((3,'<[sS].|<'+any_character+'[sS]',1)),
+        'G-ExtNonInit': window((2,'<[sS]',1),(3,'<'+any_character+'[sS]',1)),
+
+        # Other
+        'Culminativity': lambda: NoPeak(),
+        'OneStress': window((1,'s',1)),
+
+        # Setting the active edge
+        'AE/R': window((2,'[^@]>',1)),
+        'AE/L': window((2,'<[^@]',1)),
+
+        # Categorical alignment (active edge)
+        '*StressAE': window((2,'@o|o@',1)),
+        '*LapseAE': window((3,'@oo|oo@',1)),
+        '*ExtLapseAE': window((4,'@ooo|ooo@',1)),
+        'InitialBeat': window((2,'<o',1),(3,'<@o',1)),
+        'PeakAE': lambda: StressBesidePeak('active edge'),
+
+        # Gradient alignment (active edge)
+        'AlignAll/AE': lambda: ActiveEdgeChoice(StressDistancesLeft(),StressDistancesRight(),'There is a problem with AlignAll/AE.'),
+        'Align/AE': lambda: Sum([LeadingUnstressed(0,True),TrailingUnstressed(0,True)],[1,1]),
+        'G-*Lapse/AE': lambda: Sum([LeadingUnstressed(1,True),TrailingUnstressed(1,True)],[1,1]),
+        'G-*ExtLapse/AE': lambda: Sum([LeadingUnstressed(2,True),TrailingUnstressed(2,True)],[1,1]),
+        'AlignPeak/AE': lambda: StressesToActiveEdge(),
+        'AlignPeak_syl/AE': lambda: ActiveEdgeChoice(PeakDistanceLeft(),PeakDistanceRight(),'There is a problem with AlignPeak/AE.'),
+
+        # Stress repulsion (active edge)
+        'NonPeriph/AE': window((2,'@[sS]|[sS]@',1)),
+        'ExtNonPeriph/AE': window((2,'@[sS]',1),(3,'@o[sS]',1),(2,'[sS]@',1),(3,'[sS]o@',1)),
+        'G-ExtNonPeriph/AE': window((2,'@[sS]',1),(3,'@'+any_character+'[sS]',1),(2,'[sS]@',1),(3,'[sS]'+any_character+'@',1)),
+        'A-ExtNonPeriph/AE': window((3,'<@[sS]',1),(4,'<@'+last_two,1),(3,'[sS]@>',1),(4,last_two+'@>',1)),
+        'NonFin': window((2,'[sS]>',1),(3,'[sS]@>',1)),
+        'ExtNonFin': window((3,last_two+'>',1),(4,last_two+'@>',1)),
+        'G-ExtNonFin': window((2,'[sS]>',1),(3,'[sS]'+syllable+'>',1),(3,'[sS]@>',1),(4,'[sS]'+syllable+'@>',1)),
+        'A-ExtNonFin': window((3,last_two+'>',1),(4,last_two+'@>',1),(2,'[sS]>',1),(3,'[sS]@>',1)),
+
+        # Reformulated rhythmic constraints
+        '*NonFinalLapse': window((3,'oo'+syllable,1)),
+        '*InternalClash': window((4,'[^@][sS][sS][^@]',1)),
+        '*InitialClash': window((3,'<[sS][sS]',1),(4,'<@[sS][sS]',1)),
+
+        # Heinz et al.
+        'FirstStressLeft': lambda: Sum([LeadingUnstressed(),FirstStressSecondary()],[2,1]),
+        'LastStressRight': lambda: Sum([TrailingUnstressed(),LastStressSecondary()],[2,1]),
+        'NoInitialStress': window((2,'<[sS]',1),(3,'<@[sS]',1)),
+        'NoStress': window((1,'[sS]',1)),
+        'Clash-at-Initial': window((2,'[sS][sS]',2),(3,'<[sS][sS]',-1)),
+        'Clash-near-Right': window((2,'[sS][sS]',2),(4,'[sS][sS]'+any_character+'>',-1),(3,'[sS][sS]>',-1)),
+        'Lapse-near-Left': window((2,'oo',2),(3,'<oo',1),(4,'<'+any_character+'oo',1),(5,'<'+any_character+any_character+'oo',-2)),
+        'Lapse-near-Right': window((2,'oo',2),(3,'oo>',-1),(4,'oo'+any_character+'>',-1),(5,'oo'+any_character+any_character+'>',-1)),
+        'H_*Clash-at-Peak': window((2,'sS|Ss',2),(2,'ss',1)),
+        'H_Lapse-at-Peak': window((4,'[^S>]oo[^S<>]',2),(3,'ooS|Soo',1)),
+
+        # Adjusted versions
+        'A-*Clash': window((2,'[sS][sS]',1),(2,'sS|Ss',1)),
+        'A-*Lapse': window((2,'oo',1),(4,'[^S<>]oo[^S<>]',1)),
+        }
+
+def compile_machine(constraint):
+    if constraint in ['DPS','REP']:
+        raise TypeError(constraint + ' depends on the input, so it is not part of the automaton (see ConstraintSet).')
+    if constraint not in MACHINES:
+        raise TypeError('There is no such constraint: ' + constraint)
+    return MACHINES[constraint]()
+
+
+## The combined automaton
+
+FIELD_BITS = 32
+
+# The product of the machines of a constraint set, with states numbered and transitions built on first use
+class Automaton:
+
+    def __init__(self,constraints):
+        self.constraints = list(constraints)
+        self.machines = [compile_machine(constraint) for constraint in self.constraints]
+        self.states = []          # state number -> tuple of machine states
+        self.state_numbers = {}   # tuple of machine states -> state number
+        self.transitions = []     # state number -> {character: (next state number, packed violations)}
+        self.finals = []          # state number -> packed violations at the right edge (None until needed)
+        self.start = self.number(tuple([machine.start for machine in self.machines]))
+
+    def number(self,state):
+        if state not in self.state_numbers:
+            self.state_numbers[state] = len(self.states)
+            self.states.append(state)
+            self.transitions.append({})
+            self.finals.append(None)
+        return self.state_numbers[state]
+
+    def pack(self,violations):
+        return sum([value << (FIELD_BITS*i) for i,value in enumerate(violations)])
+
+    def add_transition(self,state_number,character):
+        steps = [machine.step(substate,character) for machine,substate in zip(self.machines,self.states[state_number])]
+        transition = (self.number(tuple([step[0] for step in steps])),self.pack([step[1] for step in steps]))
+        self.transitions[state_number][character] = transition
+        return transition
+
+    def final(self,state_number):
+        if self.finals[state_number] == None:
+            self.finals[state_number] = self.pack([machine.final(substate) for machine,substate in zip(self.machines,self.states[state_number])])
+        return self.finals[state_number]
+
+    # Advance from a state over a string; output: (state number, packed violations added)
+    def run(self,state_number,string):
+        transitions = self.transitions
+        total = 0
+        for character in string:
+            transition = transitions[state_number].get(character)
+            if transition == None:
+                transition = self.add_transition(state_number,character)
+            state_number, violations = transition
+            total += violations
+        return state_number, total
+
+    def unpack(self,total):
+        violations = array('I')
+        violations.frombytes(total.to_bytes(4*len(self.machines),'little'))
+        return violations.tolist()
+
+    # output: a vector of integers, one for each constraint (in the order of the constraint set)
+    def score(self,candidate_surface):
+        state_number, total = self.run(self.start,candidate_surface)
+        return self.unpack(total + self.final(state_number))
+
+    # Score all candidates of lengths min_length-max_length (as generated by get_candidates) in one depth-first walk over the trie of their prefixes:
+    # each prefix is scanned once, for all the candidates (of all lengths) that begin with it, and only the right edge is added for each candidate,
+    # so scoring all lengths up to n costs about as much as scoring length n alone
+    # output: a dictionary, surface form -> violations (in the order of the constraint set)
+    def score_lengths(self,min_length,max_length,tiers,active_edge=False):
+        # Syllables of the stress patterns, and whether the pattern has a peak (exactly one S) or only secondary stresses (at least one s)
+        if 1 in tiers and 2 in tiers:
+            syllables, peak = 'osS', True
+        elif 1 in tiers:
+            syllables, peak = 'os', False
+        else:
+            syllables, peak = 'oS', True
+        transitions = self.transitions
+        scores = {}
+        # Each walk: (left edge of the surface forms, state after the left edge, violations of the left edge)
+        walks = [['',self.start,0]]
+        if active_edge:
+            state_number, violations = self.run(self.start,'@')
+            walks = [['',self.start,0],['@',state_number,violations]]
+        for left_edge, start, start_violations in walks:
+            stack = [('',start,start_violations,False)]      # (prefix, state, violations so far, whether it has a peak / any stress)
+            while stack:
+                prefix, state_number, total, stressed = stack.pop()
+                if stressed and len(prefix) >= min_length:
+                    if not active_edge:
+                        scores[prefix] = self.unpack(total + self.final(state_number))
+                    elif left_edge:
+                        scores['@'+prefix] = self.unpack(total + self.final(state_number))
+                    else:
+                        edge_state, edge_violations = self.run(state_number,'@')
+                        scores[prefix+'@'] = self.unpack(total + edge_violations + self.final(edge_state))
+                if len(prefix) < max_length:
+                    for syllable in syllables:
+                        if syllable == 'S' and stressed:
+                            continue
+                        transition = transitions[state_number].get(syllable)
+                        if transition == None:
+                            transition = self.add_transition(state_number,syllable)
+                        stack.append((prefix+syllable,transition[0],total+transition[1],stressed or syllable == ('S' if peak else 's')))
+        return scores
+
+
+# Check that the automaton agrees with count_violations on every constraint (one automaton per constraint, so that errors are compared separately),
+# and that the combined automaton of each theory agrees on whole rows
+# output: a list of disagreements
+def compare_with_reference(min_length=2,max_length=10):
+    disagreements = []
+    automata = {constraint:Automaton([constraint]) for constraint in MACHINES}
+    theories = [[constraint for constraint in theory if constraint not in ['DPS','REP']] for theory in [constraints_Gordon,constraints_AE,constraints_HeinzEtAl]]
+    combined = [Automaton(theory) for theory in theories]
+    for length in range(min_length,max_length+1):
+        for tiers in [[1],[1,2],[2]]:
+            for active_edge in [False,True]:
+                for surface in get_candidates('o'*length,tiers,active_edge):
+                    for constraint in MACHINES:
+                        try:
+                            expected = count_violations(['o'*length,surface],[constraint])[0]
+                        except (TypeError,ValueError) as error:
+                            expected = type(error)
+                        try:
+                            value = automata[constraint].score(surface)[0]
+                        except (TypeError,ValueError) as error:
+                            value = type(error)
+                        if value != expected:
+                            disagreements.append((constraint,surface,value,expected))
+                    if tiers == [1,2]:
+                        for theory, automaton in zip(theories,combined):
+                            if automaton.score(surface) != count_violations(['o'*length,surface],theory):
+                                disagreements.append((theory,surface))
+    return disagreements
+
+
+if __name__ == '__main__':
+    max_length = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    disagreements = compare_with_reference(2,max_length)
+    for disagreement in disagreements[:50]:
+        print(disagreement)
+    print(str(len(disagreements)) + ' disagreements between the automaton and count_violations for lengths 2-' + str(max_length))
@@ -0,0 +1,218 @@
+# This file benchmarks the stages of the program: generating inputs (get_inputs), generating candidates (get_candidates),
+# computing violations (count_violations, and the tableau scorer used by main.py) and writing the OTSoft file
+# Each benchmark case is one theory (see theories in constraints.py), one setting of DPS/REP and one word length, and runs in a fresh process, so that its peak memory
+# and its caches do not depend on the other cases
+# For each case, the benchmark reports the time of each stage, the throughput (candidates per second), the peak memory of the process,
+# and the cost of each constraint (microseconds per candidate, measured with the compiled scorers of the backend on a sample of the candidates)
+# Results are saved as JSON, and two result files (e.g. of two commits) can be compared, flagging the slowdowns above a threshold
+#
+# Usage from the command line:
+# python benchmark.py run [--min-length 2] [--max-length 12] [--theories Gordon AE HeinzEtAl] [--settings off on] [--backend regex] [--output FILE]
+# python benchmark.py compare OLD.json NEW.json [--threshold 10]
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+import multiprocessing
+from datetime import datetime
+from constraints import *
+from representation_generator import *
+from tableaux import *
+
+
+settings = {'off':(False,False), 'on':(True,True), 'DPS':(True,False), 'REP':(False,True)}    # setting -> (DPS, REP)
+grid_tiers = [1,2]
+minimal_time = 0.001    # stages faster than this (in seconds) are too noisy to be flagged as slowdowns
+
+
+# Peak memory of the current process, in megabytes
+def peak_memory():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':    # bytes on macOS, kilobytes elsewhere
+        return peak/(1024*1024)
+    return peak/1024
+
+# Every step-th candidate, so that at most sample_size candidates are scored per constraint
+def sample_of(cands,sample_size):
+    step = max(1,len(cands)//sample_size)
+    return cands[::step]
+
+# The cost of each constraint, compiled alone as the backend compiles it (see ConstraintSet and bitmask_backend.py), in microseconds per candidate
+# Each constraint scores the sample once as a warm-up (so that compiling regular expressions or automaton states on first use is not counted),
+# and is then timed on the same sample; the candidates cycle through the inputs of the case (for DPS and REP)
+def constraint_costs(constraints,inputs,sample,backend):
+    costs = {}
+    for constraint in constraints:
+        if backend == 'bitmask':
+            from bitmask_backend import violation_matrix
+            score = lambda: violation_matrix(sample,[constraint],inputs[-1])      # one input for the whole batch
+        else:
+            constraint_set = ConstraintSet([constraint],cache=False,engine='automaton' if backend in ['automaton','trie'] else 'regex')
+            candidates = [[inputs[i%len(inputs)],sample[i]] for i in range(len(sample))]
+            score = lambda: [constraint_set.count_violations(candidate) for candidate in candidates]
+        score()
+        stage_start = time.perf_counter()
+        score()
+        costs[constraint] = (time.perf_counter()-stage_start)/len(sample)*1e6
+    return costs
+
+# Run one benchmark case (in a fresh process)
+# output: a dictionary with the case, the time of each stage, throughput, peak memory and the cost of each constraint
+def run_case(theory,setting,length,backend,sample_size):
+    constraints = theories[theory]
+    dps, rep = settings[setting]
+    active_edge = theory in active_edge_theories
+    timings = {}
+
+    stage_start = time.perf_counter()
+    inputs = list(get_inputs(length,length,dps,rep))
+    timings['inputs'] = time.perf_counter()-stage_start
+
+    stage_start = time.perf_counter()
+    cands = list(get_candidates('o'*length,grid_tiers,active_edge))
+    timings['candidates'] = time.perf_counter()-stage_start
+
+    constraint_cost = constraint_costs(constraints,inputs,sample_of(cands,sample_size),backend)
+
+    # Scoring and writing, as in main.py: tableaux are streamed from the scorer into the writer
+    scoring_timings = {}
+    with tempfile.TemporaryDirectory() as directory:
+        file_name = os.path.join(directory,'OTSoft input.txt')
+        stage_start = time.perf_counter()
+        write_otsoft(file_name,constraints,get_tableaux(inputs,constraints,grid_tiers,active_edge,backend,timings=scoring_timings))
+        total = time.perf_counter()-stage_start
+        file_size = os.path.getsize(file_name)
+    timings['scoring'] = scoring_timings['candidates'] + scoring_timings['scoring']
+    timings['writing'] = total - timings['scoring']
+
+    number_of_candidates = len(cands)*len(inputs)
+    return {'theory':theory, 'setting':setting, 'length':length, 'backend':backend,
+            'inputs':len(inputs), 'candidates':number_of_candidates, 'file_size':file_size,
+            'timings':timings,
+            'throughput':{'candidates':len(cands)/max(timings['candidates'],1e-9),
+                          'scoring':number_of_candidates/max(timings['scoring'],1e-9),
+                          'writing':number_of_candidates/max(timings['writing'],1e-9)},
+            'peak_memory_mb':peak_memory(),
+            'constraint_cost_us':constraint_cost}
+
+# The current commit, if the program runs inside a git repository
+def current_commit():
+    try:
+        return subprocess.run(['git','rev-parse','--short','HEAD'],capture_output=True,text=True,cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        return None
+
+# Run all benchmark cases, each in its own process, and print a line per case
+def run_benchmarks(theory_names,setting_names,min_length,max_length,backend,sample_size):
+    results = []
+    for theory in theory_names:
+        for setting in setting_names:
+            for length in range(min_length,max_length+1):
+                with multiprocessing.Pool(1) as pool:
+                    result = pool.apply(run_case,(theory,setting,length,backend,sample_size))
+                results.append(result)
+                print(case_name(result) + '\t' + str(result['candidates']) + ' candidates\t'
+                      + '\t'.join([stage + ' %.3fs' % result['timings'][stage] for stage in result['timings']])
+                      + '\t%.0f candidates/s scored' % result['throughput']['scoring'] + '\t%.1f MB' % result['peak_memory_mb'])
+                sys.stdout.flush()
+    return {'commit':current_commit(), 'date':datetime.now().strftime("%Y-%m-%d %H.%M.%S"),
+            'python':platform.python_version(), 'machine':platform.machine(), 'results':results}
+
+def case_name(result):
+    return result['theory'] + ' DPS/REP=' + result['setting'] + ' length=' + str(result['length'])
+
+# Print the most expensive constraints of the longest words of each theory
+def print_constraint_costs(benchmark,number_of_constraints=10):
+    for theory in theories:
+        cases = [result for result in benchmark['results'] if result['theory'] == theory]
+        if cases:
+            longest = max(cases,key=lambda result: result['length'])
+            costs = sorted(longest['constraint_cost_us'].items(),key=lambda item: -item[1])
+            print('Most expensive constraints (' + case_name(longest) + '): '
+                  + ', '.join([constraint + ' %.1fus' % cost for constraint,cost in costs[:number_of_constraints]]))
+
+
+# Compare two benchmark results, case by case
+# output: the number of cases found in both results, and a list of slowdowns above the threshold (percent), as (case, what was measured, old value, new value)
+# Time per stage and constraint cost are compared; peak memory is flagged by the same threshold
+def compare_benchmarks(old,new,threshold=10):
+    old_cases = {(result['theory'],result['setting'],result['length'],result['backend']):result for result in old['results']}
+    slowdowns = []
+    number_of_cases = 0
+    factor = 1 + threshold/100
+    for result in new['results']:
+        old_result = old_cases.get((result['theory'],result['setting'],result['length'],result['backend']))
+        if old_result == None:
+            continue
+        number_of_cases += 1
+        for stage in result['timings']:
+            old_time, new_time = old_result['timings'].get(stage), result['timings'][stage]
+            if old_time != None and max(old_time,new_time) >= minimal_time and new_time > old_time*factor:
+                slowdowns.append((case_name(result),stage,old_time,new_time))
+        for constraint in result['constraint_cost_us']:
+            old_cost, new_cost = old_result['constraint_cost_us'].get(constraint), result['constraint_cost_us'][constraint]
+            if old_cost != None and new_cost > old_cost*factor:
+                slowdowns.append((case_name(result),constraint + ' (us per candidate)',old_cost,new_cost))
+        if result['peak_memory_mb'] > old_result['peak_memory_mb']*factor:
+            slowdowns.append((case_name(result),'peak memory (MB)',old_result['peak_memory_mb'],result['peak_memory_mb']))
+    return number_of_cases, slowdowns
+
+
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Benchmark the generation, scoring and writing of tableaux.')
+    commands = parser.add_subparsers(dest='command',required=True)
+    run = commands.add_parser('run',help='run the benchmarks and save the results as JSON')
+    run.add_argument('--min-length',type=int,default=2)
+    run.add_argument('--max-length',type=int,default=12)
+    run.add_argument('--theories',nargs='+',choices=list(theories),default=list(theories))
+    run.add_argument('--settings',nargs='+',choices=list(settings),default=['off','on'],help='DPS/REP settings: off (neither), on (both), DPS, REP (default: off on)')
+    run.add_argument('--backend',choices=['regex','bitmask','automaton','trie'],default='regex',help='backend of the tableau scorer (default: %(default)s)')
+    run.add_argument('--sample',type=int,default=2000,help='number of candidates per case for the cost of each constraint (default: %(default)s)')
+    run.add_argument('--output',help='JSON file for the results (default: a time-stamped file in Benchmarks/)')
+    compare = commands.add_parser('compare',help='compare two JSON results and flag slowdowns')
+    compare.add_argument('old')
+    compare.add_argument('new')
+    compare.add_argument('--threshold',type=float,default=10,help='flag slowdowns above this percentage (default: %(default)s)')
+    return parser.parse_args()
+
+
+def main():
+    arguments = parse_arguments()
+
+    if arguments.command == 'run':
+        benchmark = run_benchmarks(arguments.theories,arguments.settings,arguments.min_length,arguments.max_length,arguments.backend,arguments.sample)
+        print_constraint_costs(benchmark)
+        output = arguments.output
+        if output == None:
+            if not os.path.isdir('Benchmarks'):
+                os.mkdir('Benchmarks')
+            output = os.path.join('Benchmarks',benchmark['date'] + ' ' + (benchmark['commit'] or 'benchmark') + '.json')
+        with open(output,'w') as file:
+            json.dump(benchmark,file,indent=1)
+        print('Saved the results in ' + output)
+
+    else:
+        with open(arguments.old) as file:
+            old = json.load(file)
+        with open(arguments.new) as file:
+            new = json.load(file)
+        number_of_cases, slowdowns = compare_benchmarks(old,new,arguments.threshold)
+        if number_of_cases == 0:
+            print('No cases to compare: the two results have no case (theory, setting, length, backend) in common')
+            sys.exit(1)
+        for case, measure, old_value, new_value in slowdowns:
+            print(case + '\t' + measure + '\t%.4g -> %.4g (+%.0f%%)' % (old_value,new_value,(new_value/max(old_value,1e-12)-1)*100))
+        print(str(len(slowdowns)) + ' slowdowns above ' + '%g' % arguments.threshold + '% in ' + str(number_of_cases) + ' compared cases ('
+              + str(old.get('commit')) + ' -> ' + str(new.get('commit')) + ')')
+        if slowdowns:
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
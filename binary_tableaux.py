@@ -0,0 +1,276 @@
+# This file defines a compact binary format for tableaux, as an alternative to the OTSoft text format for large runs and later analysis
+# A file has the following sections (all integers little-endian, each section starting at a multiple of 8 bytes; files are written and read on little-endian machines):
+# 1. header: magic 'OTTB', format version, bytes per violation value, number of constraints, rows, inputs and surface tables, and the offset of each section
+# 2. violation matrix: one row per candidate, one fixed-width unsigned integer per constraint, in the order of the tableaux
+#    (the narrowest width that fits all the values: 1 byte, widened to 2 or 4 bytes when a larger value is written, unless a width is given)
+# 3. surface tables: one table per string length of the surface forms, each surface form stored once, as a 64-bit integer code (see encode_surface)
+# 4. table directory: for each table, the position of its first code and its number of codes (two 64-bit integers)
+# 5. row references: for the tableaux whose candidates are not the beginning of their table (e.g. pruned tableaux), the position of each candidate in the table (32-bit integers)
+# 6. index: for each input, its first row, number of rows, table and position of its row references (four 64-bit integers; no references: all bits set,
+#    the candidates are the first rows of the table, as for the tableaux of get_candidates, which all share the candidates of their length)
+# 7. metadata: JSON with the constraint names and the inputs (in the order of the index)
+# Files are read with memory mapping, so a single tableau can be read without loading the rest of the file,
+# and converted back into the OTSoft text layout of write_otsoft (byte for byte)
+#
+# Usage from the command line:
+# python binary_tableaux.py info FILE                  - number of inputs, rows and constraints
+# python binary_tableaux.py to-otsoft FILE OTSOFT_FILE - convert into an OTSoft text file
+
+import sys
+import json
+import mmap
+import struct
+import tempfile
+import itertools
+from array import array
+
+magic = b'OTTB'
+version = 2
+header = struct.Struct('<4sHHIQQQQQQQQQQ')   # magic, version, bytes per value, constraints, rows, inputs, tables,
+                                             # offsets of the matrix, surface tables, table directory, row references, index and metadata, length of the metadata
+typecodes = {1:'B', 2:'H', 4:'I'}
+no_references = (1<<64) - 1
+surface_alphabet = 'osS@'
+alignment = 8
+
+
+def check_byte_order():
+    if sys.byteorder != 'little':
+        raise TypeError('Binary tableaux files can only be written and read on little-endian machines')
+
+# Pad a file with zeros up to the next multiple of the alignment
+def pad(file):
+    file.write(bytes(-file.tell() % alignment))
+
+
+# Encode a surface form as an integer: a leading 1, followed by two bits per character (o=0, s=1, S=2, @=3)
+def encode_surface(surface):
+    if len(surface) > 31:
+        raise TypeError('Surface forms longer than 31 characters cannot be encoded: ' + surface)
+    code = 1
+    for character in surface:
+        code = code << 2 | surface_alphabet.index(character)
+    return code
+
+def decode_surface(code):
+    characters = []
+    while code > 1:
+        characters.append(surface_alphabet[code & 3])
+        code >>= 2
+    return ''.join(reversed(characters))
+
+
+# Write tableaux into a binary file, one tableau at a time (the same interface as OTSoftWriter in tableaux.py)
+# value_bytes: bytes per violation value (1, 2 or 4), or None for the narrowest width that fits the values
+# The violation matrix is written directly into the file (and rewritten at a larger width if a value does not fit);
+# the surface tables are kept in memory and the row references go through a temporary file, and both are appended at the end
+class BinaryWriter:
+
+    def __init__(self,file_name,constraints,value_bytes=None,buffer_size=1<<20):
+        if value_bytes != None and value_bytes not in typecodes:
+            raise TypeError('Violation values can have 1, 2 or 4 bytes, not ' + str(value_bytes))
+        check_byte_order()
+        self.constraints = list(constraints)
+        self.fixed_width = value_bytes != None
+        self.value_bytes = value_bytes if value_bytes != None else 1
+        self.typecode = typecodes[self.value_bytes]
+        self.file = open(file_name,'w+b',buffering=buffer_size)
+        self.file.write(bytes(header.size))     # filled in by close
+        pad(self.file)
+        self.matrix_offset = self.file.tell()
+        self.tables = {}        # string length -> [table number, surface forms, position of each surface form]
+        self.references = tempfile.TemporaryFile(buffering=buffer_size)
+        self.number_of_references = 0
+        self.inputs = []
+        self.index = array('Q')
+        self.number_of_rows = 0
+
+    def write(self,input,cands,violation_vectors):
+        try:
+            values = array(self.typecode,itertools.chain.from_iterable(violation_vectors))
+        except OverflowError:
+            self.widen(input,max([max(vector) for vector in violation_vectors]))
+            values = array(self.typecode,itertools.chain.from_iterable(violation_vectors))
+        if len(values) != len(cands)*len(self.constraints):
+            raise TypeError('Each candidate of ' + input + ' must have one violation value per constraint')
+        values.tofile(self.file)
+        table_number, references = self.add_surfaces(cands)
+        if references == None:
+            self.index.extend([self.number_of_rows,len(cands),table_number,no_references])
+        else:
+            self.index.extend([self.number_of_rows,len(cands),table_number,self.number_of_references])
+            array('I',references).tofile(self.references)
+            self.number_of_references += len(references)
+        self.inputs.append(input)
+        self.number_of_rows += len(cands)
+
+    # Rewrite the violation matrix written so far with the narrowest width that fits a value
+    def widen(self,input,maximum):
+        widths = [width for width in typecodes if width > self.value_bytes and maximum < 1<<(8*width)]
+        if self.fixed_width or not widths:
+            raise OverflowError('Violations of ' + input + ' do not fit in ' + str(self.value_bytes) + ' bytes per value')
+        values = array(self.typecode)
+        self.file.seek(self.matrix_offset)
+        values.fromfile(self.file,self.number_of_rows*len(self.constraints))
+        self.value_bytes = widths[0]
+        self.typecode = typecodes[self.value_bytes]
+        self.file.seek(self.matrix_offset)
+        array(self.typecode,values).tofile(self.file)
+
+    # Add the surface forms of a tableau to the table of their string length
+    # output: the table number, and the position of each candidate in the table (None if the candidates are the beginning of the table)
+    def add_surfaces(self,cands):
+        if not cands:
+            return no_references, None
+        if len(cands[0]) not in self.tables:
+            self.tables[len(cands[0])] = [len(self.tables),[],{}]
+        table_number, surfaces, positions = self.tables[len(cands[0])]
+        if len(cands) > len(surfaces) and surfaces == cands[:len(surfaces)]:
+            for cand in cands[len(surfaces):]:
+                positions[cand] = len(surfaces)
+                surfaces.append(cand)
+        if len(cands) <= len(surfaces) and cands == surfaces[:len(cands)]:
+            return table_number, None
+        for cand in cands:
+            if cand not in positions:
+                positions[cand] = len(surfaces)
+                surfaces.append(cand)
+        return table_number, [positions[cand] for cand in cands]
+
+    def close(self):
+        pad(self.file)
+        tables_offset = self.file.tell()
+        tables = sorted(self.tables.values())
+        directory = array('Q')
+        for table_number, surfaces, positions in tables:
+            directory.extend([(self.file.tell()-tables_offset)//8,len(surfaces)])
+            array('Q',[encode_surface(surface) for surface in surfaces]).tofile(self.file)
+        directory_offset = self.file.tell()
+        directory.tofile(self.file)
+        references_offset = self.file.tell()
+        self.references.seek(0)
+        while True:
+            chunk = self.references.read(1<<20)
+            if not chunk:
+                break
+            self.file.write(chunk)
+        self.references.close()
+        pad(self.file)
+        index_offset = self.file.tell()
+        self.index.tofile(self.file)
+        metadata_offset = self.file.tell()
+        metadata = json.dumps({'constraints':self.constraints, 'inputs':self.inputs}).encode('utf-8')
+        self.file.write(metadata)
+        self.file.seek(0)
+        self.file.write(header.pack(magic,version,self.value_bytes,len(self.constraints),self.number_of_rows,len(self.inputs),len(tables),
+                                    self.matrix_offset,tables_offset,directory_offset,references_offset,index_offset,metadata_offset,len(metadata)))
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exception):
+        self.close()
+
+# Write a stream of tableaux into a binary file (the same interface as write_otsoft)
+def write_binary(file_name,constraints,tableaux,value_bytes=None):
+    with BinaryWriter(file_name,constraints,value_bytes) as writer:
+        for input, cands, violation_vectors in tableaux:
+            writer.write(input,cands,violation_vectors)
+
+
+# A binary tableaux file, memory-mapped: only the parts that are read are loaded
+# Iterating over it yields [input,candidates,violations] for each tableau, as get_tableaux does
+class BinaryTableaux:
+
+    def __init__(self,file_name):
+        check_byte_order()
+        self.file = open(file_name,'rb')
+        self.map = mmap.mmap(self.file.fileno(),0,access=mmap.ACCESS_READ)
+        (file_magic, file_version, self.value_bytes, self.number_of_constraints, self.number_of_rows, self.number_of_inputs, number_of_tables,
+         self.matrix_offset, self.tables_offset, directory_offset, self.references_offset, self.index_offset, metadata_offset, metadata_length) = header.unpack_from(self.map,0)
+        if file_magic != magic or file_version != version:
+            raise TypeError(file_name + ' is not a binary tableaux file (version ' + str(version) + ')')
+        metadata = json.loads(self.map[metadata_offset:metadata_offset+metadata_length].decode('utf-8'))
+        self.constraints = metadata['constraints']
+        self.inputs = metadata['inputs']
+        self.input_numbers = {input:number for number,input in enumerate(self.inputs)}
+        self.view = memoryview(self.map)
+        self.directory = self.view[directory_offset : directory_offset + 16*number_of_tables].cast('Q').tolist()
+        self.tables = {}       # table number -> surface forms (decoded when first read)
+
+    def __len__(self):
+        return self.number_of_inputs
+
+    # The first row and the number of rows of an input (by input string or by number)
+    def rows(self,input):
+        number = self.input_numbers[input] if isinstance(input,str) else input
+        return struct.unpack_from('<QQ',self.map,self.index_offset + 32*number)
+
+    # The surface forms of a table
+    def table(self,table_number):
+        if table_number not in self.tables:
+            first_code, number_of_codes = self.directory[2*table_number : 2*table_number+2]
+            codes = self.view[self.tables_offset + 8*first_code : self.tables_offset + 8*(first_code+number_of_codes)].cast('Q').tolist()
+            self.tables[table_number] = [decode_surface(code) for code in codes]
+        return self.tables[table_number]
+
+    # output: [input,candidates,violations] of one input (by input string or by number)
+    def tableau(self,input):
+        number = self.input_numbers[input] if isinstance(input,str) else input
+        first_row, number_of_rows, table_number, first_reference = struct.unpack_from('<QQQQ',self.map,self.index_offset + 32*number)
+        if number_of_rows == 0:
+            cands = []
+        elif first_reference == no_references:
+            cands = self.table(table_number)[:number_of_rows]
+        else:
+            surfaces = self.table(table_number)
+            references = self.view[self.references_offset + 4*first_reference : self.references_offset + 4*(first_reference+number_of_rows)].cast('I').tolist()
+            cands = [surfaces[reference] for reference in references]
+        row_size = self.value_bytes*self.number_of_constraints
+        values = self.view[self.matrix_offset + row_size*first_row : self.matrix_offset + row_size*(first_row+number_of_rows)].cast(typecodes[self.value_bytes]).tolist()
+        k = self.number_of_constraints
+        return [self.inputs[number],cands,[values[i:i+k] for i in range(0,len(values),k)]]
+
+    def __iter__(self):
+        for number in range(self.number_of_inputs):
+            yield self.tableau(number)
+
+    # The whole violation matrix as a NumPy array (rows x constraints) over the memory map, without copying (requires NumPy)
+    # (the array must be deleted before the file is closed)
+    def matrix(self):
+        import numpy
+        return numpy.frombuffer(self.map,dtype='<u' + str(self.value_bytes),count=self.number_of_rows*self.number_of_constraints,
+                                offset=self.matrix_offset).reshape(self.number_of_rows,self.number_of_constraints)
+
+    def close(self):
+        self.view.release()
+        self.map.close()
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exception):
+        self.close()
+
+
+# Convert a binary tableaux file into an OTSoft text file (the same file that write_otsoft writes for the same tableaux)
+def binary_to_otsoft(binary_file_name,otsoft_file_name):
+    from tableaux import write_otsoft
+    with BinaryTableaux(binary_file_name) as tableaux:
+        write_otsoft(otsoft_file_name,tableaux.constraints,tableaux)
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    if len(arguments) == 2 and arguments[0] == 'info':
+        with BinaryTableaux(arguments[1]) as tableaux:
+            print(str(tableaux.number_of_inputs) + ' inputs, ' + str(tableaux.number_of_rows) + ' rows, ' + str(tableaux.number_of_constraints) + ' constraints ('
+                  + str(tableaux.value_bytes) + ' bytes per value): ' + ', '.join(tableaux.constraints))
+    elif len(arguments) == 3 and arguments[0] == 'to-otsoft':
+        binary_to_otsoft(arguments[1],arguments[2])
+        print('Converted ' + arguments[1] + ' into ' + arguments[2])
+    else:
+        print('Usage: python binary_tableaux.py info FILE | to-otsoft FILE OTSOFT_FILE')
+        sys.exit(1)
@@ -0,0 +1,335 @@
+# This file defines an optional vectorized backend for computing constraint violations, based on NumPy
+# All candidates of one length are encoded as integer arrays of bitmasks, and every constraint in CON is computed for the whole batch at once
+# with array and bit operations (e.g. adjacent-bit ANDs for clash/lapse, popcounts for OneStress/NoStress, index arithmetic for AlignAll/AlignPeak_syl)
+# count_violations in representation_generator.py remains the reference; compare_backends checks that both backends agree
+#
+# Encoding: each candidate string is placed in n+2 slots (bit j of a mask = slot j):
+# slot 0 = left active edge (@), slots 1..n = syllables, slot n+1 = right active edge (@)
+# A candidate without an active edge leaves slots 0 and n+1 empty, so a regex character class becomes a mask, a sequence of characters
+# becomes an AND of shifted masks, and the string anchors (^ and $) become the masks of the first and last occupied slot
+
+import sys
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+from constraints import *
+from representation_generator import *
+
+
+# Encode the surface forms of a batch of candidates (all with the same number of syllables), and optionally their input, as bitmasks
+class CandidateBatch:
+
+    def __init__(self,surfaces,input=None):
+        if np is None:
+            raise ImportError('The bitmask backend requires NumPy.')
+        self.surfaces = list(surfaces)
+        self.size = len(self.surfaces)
+        self.n = len(self.surfaces[0].replace('@','')) if self.surfaces else 0
+        width = self.n + 2
+        if width > 64:
+            raise TypeError('The bitmask backend packs a word into 64 bits, so it handles words of up to 62 syllables, not ' + str(self.n))
+
+        padded = []
+        for surface in self.surfaces:
+            if len(surface.replace('@','')) != self.n:
+                raise TypeError('All candidates in a batch must have the same number of syllables.')
+            if surface[0] == '@':
+                padded.append(surface + ' ')
+            elif surface[-1] == '@':
+                padded.append(' ' + surface)
+            else:
+                padded.append(' ' + surface + ' ')
+        chars = np.frombuffer(''.join(padded).encode('ascii'),dtype=np.uint8).reshape(self.size,width)
+        slot_bits = np.left_shift(np.uint64(1),np.arange(width,dtype=np.uint64))
+
+        def mask(symbol):
+            return ((chars == ord(symbol)) * slot_bits).sum(axis=1,dtype=np.uint64)
+
+        self.O = mask('o')             # unstressed syllables
+        self.s = mask('s')             # secondary stresses
+        self.S = mask('S')             # peaks
+        self.AT = mask('@')            # active edge
+        self.ST = self.s | self.S      # any stress, [sS]
+        self.ANY = self.O | self.ST | self.AT    # any character, .
+        self.NS = self.ANY & ~self.S   # any character but the peak, [^S]
+        self.left = (self.AT & np.uint64(1)) != 0
+        self.right = (self.AT & (np.uint64(1) << np.uint64(self.n+1))) != 0
+        self.B = np.where(self.left,np.uint64(1),np.uint64(2))                                        # first character, ^
+        self.E = np.where(self.right,np.uint64(1) << np.uint64(self.n+1),np.uint64(1) << np.uint64(self.n))   # last character, $
+
+        # input-dependent masks, for DPS and REP
+        self.input = input
+        if input != None:
+            if len(input) != self.n:
+                raise TypeError('Input and stripped candidate do not have identical length.')
+            self.D = np.uint64(sum([1 << (i+1) for i in range(self.n) if input[i] == 'D']))
+            self.R = np.uint64(sum([1 << (i+1) for i in range(self.n) if input[i] == 'R']))
+
+
+## Bit operations on arrays of masks
+
+# Character at slot j+k (for regex sequences and lookaheads); the result has bit j set
+def nxt(mask,k):
+    return mask >> np.uint64(k)
+
+# Character at slot j-k (for lookbehinds); the result has bit j set
+def prv(mask,k):
+    return mask << np.uint64(k)
+
+# Number of set bits in each mask
+def popcount(mask):
+    mask = mask - ((mask >> np.uint64(1)) & np.uint64(0x5555555555555555))
+    mask = (mask & np.uint64(0x3333333333333333)) + ((mask >> np.uint64(2)) & np.uint64(0x3333333333333333))
+    mask = (mask + (mask >> np.uint64(4))) & np.uint64(0x0f0f0f0f0f0f0f0f)
+    return ((mask * np.uint64(0x0101010101010101)) >> np.uint64(56)).astype(np.int64)
+
+# 1 for each non-empty mask, 0 otherwise (for categorical constraints)
+def nonzero(mask):
+    return (mask != 0).astype(np.int64)
+
+# All slots below a single-bit mask (none if the mask is empty)
+def below(bit):
+    return np.where(bit == 0,np.uint64(0),bit - np.uint64(1))
+
+# All slots above a single-bit mask (none if the mask is empty)
+def above(bit):
+    return ~((bit << np.uint64(1)) - np.uint64(1))
+
+# Slot index of the lowest set bit (64 for an empty mask)
+def lowest_index(mask):
+    return popcount((mask & (~mask + np.uint64(1))) - np.uint64(1))
+
+# Slot index of the highest set bit (-1 for an empty mask)
+def highest_index(mask):
+    for k in [1,2,4,8,16,32]:
+        mask = mask | (mask >> np.uint64(k))
+    return popcount(mask) - 1
+
+# Sum of the distances of the set syllable slots from the left edge (in syllables)
+def sum_of_indeces(batch,mask):
+    total = np.zeros(batch.size,dtype=np.int64)
+    for j in range(1,batch.n+1):
+        total = total + ((mask >> np.uint64(j)) & np.uint64(1)).astype(np.int64)*(j-1)
+    return total
+
+# Number of unstressed syllables before the first stress and after the last stress
+def leading_unstressed(batch):
+    return np.where(batch.ST == 0,batch.n,lowest_index(batch.ST)-1)
+
+def trailing_unstressed(batch):
+    return np.where(batch.ST == 0,batch.n,batch.n-highest_index(batch.ST))
+
+# Peaks must exist for the constraints that measure the distance of the peak from an edge (like str.index in count_violations)
+def peak_index(batch):
+    if np.any(batch.S == 0):
+        raise ValueError('substring not found')
+    return lowest_index(batch.S)-1
+
+# Choose the left or the right version of a gradient constraint by the active edge
+def by_active_edge(batch,left_values,right_values,name):
+    if not np.all(batch.left | batch.right):
+        raise TypeError('There is a problem with ' + name + '.')
+    return np.where(batch.left,left_values,right_values)
+
+# Count the non-overlapping occurrences of a 4-character sequence (like re.findall without lookahead), from left to right
+def non_overlapping(batch,occurrences):
+    selected = np.zeros(batch.size,dtype=np.uint64)
+    for j in range(batch.n+2):
+        take = (occurrences >> np.uint64(j)) & np.uint64(1)
+        if j >= 3:
+            take = take & ~(selected >> np.uint64(j-3))
+        selected = selected | ((take & np.uint64(1)) << np.uint64(j))
+    return popcount(selected)
+
+
+## Violation columns, one function per constraint name
+
+def clash(b):
+    return b.ST & nxt(b.ST,1)
+
+def lapse(b):
+    return b.O & nxt(b.O,1)
+
+def clash_at_peak(b):
+    return (b.s & nxt(b.S,1)) | (b.S & nxt(b.s,1))
+
+def lapse_not_at_peak(b):
+    return b.NS & nxt(b.O,1) & nxt(b.O,2) & nxt(b.NS,3)
+
+def align_left(b):
+    return leading_unstressed(b)
+
+def align_right(b):
+    return trailing_unstressed(b)
+
+# Position of the end of the string, optionally preceded by a final active edge (@?$)
+def end_of_string(b):
+    return (b.E << np.uint64(1)) | (b.E & b.AT)
+
+COLUMNS = {
+        # Rhythm
+        '*Clash': lambda b: popcount(clash(b)),
+        '*Lapse': lambda b: popcount(lapse(b)),
+        '*Clash-at-Peak': lambda b: popcount(clash_at_peak(b)),
+        '*Lapse-not-at-Peak': lambda b: popcount(lapse_not_at_peak(b)),
+        '*Lapse-in-Trough': lambda b: non_overlapping(b,b.s & nxt(b.O,1) & nxt(b.O,2) & nxt(b.s,3)),
+        '*ExtClash': lambda b: popcount(b.ST & (nxt(b.ST,1) | (nxt(b.O,1) & nxt(b.ST,2)))),
+        '*ExtLapse': lambda b: popcount(b.O & nxt(b.O,1) & nxt(b.O,2)),
+
+        # Categorical alignment
+        'Stress/L': lambda b: nonzero(b.B & b.O),
+        'Stress/R': lambda b: nonzero(b.E & b.O),
+        '*Lapse/L': lambda b: nonzero(b.B & b.O & nxt(b.O,1)),
+        '*Lapse/R': lambda b: nonzero(b.E & b.O & prv(b.O,1)),
+        '*ExtLapse/L': lambda b: nonzero(b.B & b.O & nxt(b.O,1) & nxt(b.O,2)),
+        '*ExtLapse/R': lambda b: nonzero(b.E & b.O & prv(b.O,1) & prv(b.O,2)),
+        'Stress/Edges': lambda b: nonzero(b.B & b.O) + nonzero(b.E & b.O),
+        'RightMost': lambda b: nonzero(b.s & above(b.S)),
+        'LeftMost': lambda b: nonzero(b.s & below(b.S)),
+
+        # Gradient alignment
+        'AlignAll/L': lambda b: sum_of_indeces(b,b.ST),
+        'AlignAll/R': lambda b: popcount(b.ST)*(b.n-1) - sum_of_indeces(b,b.ST),
+        'Align/L': align_left,
+        'Align/R': align_right,
+        'Align/Edges': lambda b: align_left(b) + align_right(b),
+        'AlignPeak/L': lambda b: popcount(b.s & below(b.S)),
+        'AlignPeak/R': lambda b: popcount(b.s & above(b.S)),
+        'AlignPeak_syl/L': lambda b: peak_index(b),
+        'AlignPeak_syl/R': lambda b: b.n - peak_index(b) - 1,
+
+        # Stress repulsion
+        'NonInit': lambda b: nonzero(b.B & b.ST),
+        'ExtNonInit': lambda b: nonzero((b.B & b.ST) | (b.B & nxt(b.ST,1))),
+        'G-ExtNonInit': lambda b: nonzero(b.B & b.ST) + nonzero(b.B & nxt(b.ST,1)),
+
+        # Other
+        'Culminativity': lambda b: (b.S == 0).astype(np.int64),
+        'OneStress': lambda b: popcount(b.s),
+
+        # Setting the active edge
+        'AE/R': lambda b: nonzero(b.E & ~b.AT),
+        'AE/L': lambda b: nonzero(b.B & ~b.AT),
+
+        # Categorical alignment (active edge)
+        '*StressAE': lambda b: popcount((b.AT & nxt(b.O,1)) | (b.O & nxt(b.AT,1))),
+        '*LapseAE': lambda b: popcount((b.AT & nxt(b.O,1) & nxt(b.O,2)) | (b.O & nxt(b.O,1) & nxt(b.AT,2))),
+        '*ExtLapseAE': lambda b: popcount((b.AT & nxt(b.O,1) & nxt(b.O,2) & nxt(b.O,3)) | (b.O & nxt(b.O,1) & nxt(b.O,2) & nxt(b.AT,3))),
+        'InitialBeat': lambda b: nonzero((b.B & b.O) | (b.B & b.AT & nxt(b.O,1))),
+        'PeakAE': lambda b: nonzero((b.s & below(b.S) & np.where(b.left,~np.uint64(0),np.uint64(0))) | (b.s & above(b.S) & np.where(b.right,~np.uint64(0),np.uint64(0)))),
+
+        # Gradient alignment (active edge)
+        'AlignAll/AE': lambda b: by_active_edge(b,COLUMNS['AlignAll/L'](b),COLUMNS['AlignAll/R'](b),'AlignAll/AE'),
+        'Align/AE': lambda b: np.where(b.left,align_left(b),np.where(b.right,align_right(b),0)),
+        'G-*Lapse/AE': lambda b: np.where(b.left,np.maximum(0,align_left(b)-1),np.where(b.right,np.maximum(0,align_right(b)-1),0)),
+        'G-*ExtLapse/AE': lambda b: np.where(b.left,np.maximum(0,align_left(b)-2),np.where(b.right,np.maximum(0,align_right(b)-2),0)),
+        'AlignPeak/AE': lambda b: np.where(b.right,popcount(b.s & above(b.S)),popcount(b.s & below(b.S))),
+        'AlignPeak_syl/AE': lambda b: by_active_edge(b,peak_index(b),b.n-peak_index(b)-1,'AlignPeak/AE'),
+
+        # Stress repulsion (active edge)
+        'NonPeriph/AE': lambda b: popcount((b.AT & nxt(b.ST,1)) | (b.ST & nxt(b.AT,1))),
+        'ExtNonPeriph/AE': lambda b: nonzero(b.AT & (nxt(b.ST,1) | (nxt(b.O,1) & nxt(b.ST,2)))) + nonzero(b.ST & (nxt(b.AT,1) | (nxt(b.O,1) & nxt(b.AT,2)))),
+        'G-ExtNonPeriph/AE': lambda b: popcount(b.ST & (prv(b.AT,1) | prv(b.AT,2) | nxt(b.AT,1) | nxt(b.AT,2))),
+        'A-ExtNonPeriph/AE': lambda b: popcount((prv(b.AT,2) & prv(b.ST,1)) | (prv(b.AT,3) & prv(b.ST,1)) | (prv(b.AT,3) & prv(b.ST,2) & prv(b.ANY,1))
+                                                | (b.ANY & nxt(b.ST,1) & nxt(b.AT,2)) | (b.ST & nxt(b.ANY,1) & nxt(b.AT,2)) | (b.ST & nxt(b.AT,1))),
+        'NonFin': lambda b: nonzero(b.ST & nxt(end_of_string(b),1)),
+        'ExtNonFin': lambda b: nonzero((b.E & b.ST) | (b.E & prv(b.ST,1) & (b.O | b.AT)) | (b.E & b.AT & prv(b.O,1) & prv(b.ST,2))),
+        'G-ExtNonFin': lambda b: popcount(b.ST & (nxt(b.E,1) | (nxt(b.E,2) & nxt(b.AT,2)) | b.E | (nxt(b.E,1) & nxt(b.AT,1)))),
+        'A-ExtNonFin': lambda b: popcount((b.ST & nxt(b.ANY,1) & nxt(end_of_string(b),2)) | (b.ANY & nxt(b.ST,1) & nxt(end_of_string(b),2)) | (b.ST & nxt(end_of_string(b),1))),
+
+        # Reformulated rhythmic constraints
+        '*NonFinalLapse': lambda b: popcount(lapse(b) & nxt(b.ANY & ~b.AT,2)),
+        '*InternalClash': lambda b: popcount(clash(b) & ~prv(b.AT,1) & ~nxt(b.AT,2)),
+        '*InitialClash': lambda b: nonzero((b.B & clash(b)) | (b.B & b.AT & nxt(clash(b),1))),
+
+        # Heinz et al.
+        'FirstStressLeft': lambda b: align_left(b)*2 + nonzero(b.s & (b.S - np.uint64(1))),
+        'LastStressRight': lambda b: align_right(b)*2 + nonzero(np.where(b.S == 0,b.s,b.s & above(b.S))),
+        'NoInitialStress': lambda b: nonzero((b.B & b.ST) | (b.B & b.AT & nxt(b.ST,1))),
+        'NoStress': lambda b: popcount(b.ST),
+        'Clash-at-Initial': lambda b: popcount(clash(b) & ~b.B)*2 + nonzero(clash(b) & b.B),
+        'Clash-near-Right': lambda b: popcount(clash(b) & below(nxt(b.E,2)))*2 + nonzero(clash(b) & nxt(b.E,2)) + nonzero(clash(b) & nxt(b.E,1)),
+        'Lapse-near-Left': lambda b: popcount(lapse(b) & ~prv(b.B,2))*2 + nonzero(lapse(b) & b.B) + nonzero(lapse(b) & prv(b.B,1)),
+        'Lapse-near-Right': lambda b: popcount(lapse(b) & below(nxt(b.E,3)))*2 + nonzero(lapse(b) & nxt(b.E,3)) + nonzero(lapse(b) & nxt(b.E,2)) + nonzero(lapse(b) & nxt(b.E,1)),
+        'H_*Clash-at-Peak': lambda b: popcount(clash_at_peak(b))*2 + popcount(b.s & nxt(b.s,1)),
+        'H_Lapse-at-Peak': lambda b: popcount(~prv(b.S,1) & lapse(b) & nxt(b.NS,2))*2 + popcount((lapse(b) & nxt(b.S,2)) | (b.S & nxt(b.O,1) & nxt(b.O,2))),
+
+        # Adjusted versions
+        'A-*Clash': lambda b: popcount(clash(b)) + popcount(clash_at_peak(b)),
+        'A-*Lapse': lambda b: popcount(lapse(b)) + popcount(lapse_not_at_peak(b)),
+
+        # Faithfulness
+        'DPS': lambda b: popcount(input_mask(b,'D') & b.O),
+        'REP': lambda b: popcount(input_mask(b,'R') & b.ST),
+        }
+
+def input_mask(batch,symbol):
+    if batch.input == None:
+        raise TypeError('DPS and REP require the input of the candidates.')
+    if symbol == 'D':
+        return batch.D
+    return batch.R
+
+
+# Compute violations for a batch of candidates of the same length
+# output: an array of shape (number of candidates, number of constraints), in the order of surfaces and constraints
+# profile: an optional profile (see profiler.py), to which the time of each constraint is added
+def violation_matrix(surfaces,constraints,input=None,profile=None):
+    for constraint in constraints:
+        if constraint not in COLUMNS:
+            raise TypeError('There is no such constraint: ' + constraint)
+    batch = CandidateBatch(surfaces,input)
+    matrix = np.zeros((batch.size,len(constraints)),dtype=np.int64)
+    for i in range(len(constraints)):
+        if profile != None:    # the time of each column is added to its constraint (see profiler.py)
+            start = time.perf_counter()
+            matrix[:,i] = np.maximum(0,COLUMNS[constraints[i]](batch))
+            profile.add_constraint(constraints[i],time.perf_counter()-start,batch.size)
+        else:
+            matrix[:,i] = np.maximum(0,COLUMNS[constraints[i]](batch))
+    return matrix
+
+
+# Check that the bitmask backend agrees with count_violations on every constraint, for every candidate of lengths min_length-max_length,
+# for all grid tiers, with and without active edges, and for inputs with a D or R syllable
+# A constraint that raises an error for some candidate in count_violations must also raise an error for the batch
+# output: a list of disagreements, each a tuple (constraint, input, surface, bitmask value, count_violations value)
+def compare_backends(min_length=2,max_length=10,constraints=None):
+    if constraints == None:
+        constraints = list(COLUMNS)
+    disagreements = []
+    for length in range(min_length,max_length+1):
+        inputs = ['o'*length, 'D'+'o'*(length-1), 'o'*(length-1)+'R']
+        for tiers in [[1],[1,2],[2]]:
+            for active_edge in [False,True]:
+                surfaces = list(get_candidates('o'*length,tiers,active_edge))
+                for input in inputs:
+                    for constraint in constraints:
+                        try:
+                            expected = [count_violations([input,surface],[constraint])[0] for surface in surfaces]
+                        except (TypeError,ValueError):
+                            expected = None
+                        try:
+                            column = violation_matrix(surfaces,[constraint],input)[:,0]
+                        except (TypeError,ValueError):
+                            column = None
+                        if expected == None or column is None:
+                            if (expected == None) != (column is None):
+                                disagreements.append((constraint,input,None,column is None,expected == None))
+                            continue
+                        for surface,value,expected_value in zip(surfaces,column,expected):
+                            if value != expected_value:
+                                disagreements.append((constraint,input,surface,int(value),expected_value))
+    return disagreements
+
+
+if __name__ == '__main__':
+    max_length = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    disagreements = compare_backends(2,max_length)
+    for disagreement in disagreements[:50]:
+        print(disagreement)
+    print(str(len(disagreements)) + ' disagreements between the bitmask backend and count_violations for lengths 2-' + str(max_length))
@@ -0,0 +1,99 @@
+# This file is a thin client of the tableau service (see service.py), for getting a few tableaux at a time without running main.py
+# It only sends a request and prints (or saves) the answer, so it starts quickly; the service does the work, with warm caches
+#
+# Usage: python client.py INPUT [INPUT ...] [--theory NAME | --constraints C1,C2,...] [--active-edge] [--tiers 1,2] [--json] [--output FILE] [--port PORT]
+#        python client.py --stats
+# Examples: python client.py oDooo --theory AE
+#           python client.py ooo oooo --theory Gordon --output tableaux.txt     (an OTSoft file, as written by main.py)
+
+import sys
+import json
+import argparse
+from urllib.request import urlopen
+from urllib.error import HTTPError
+from urllib.parse import urlencode
+
+default_port = 8765     # as in service.py (not imported, so the client does not load the constraints)
+
+
+def request(path,parameters,port=default_port):
+    url = 'http://127.0.0.1:' + str(port) + path + ('?' + urlencode(parameters) if parameters else '')
+    try:
+        with urlopen(url) as response:
+            return response.read().decode('utf-8')
+    except HTTPError as error:
+        raise TypeError(json.loads(error.read().decode('utf-8'))['error'])
+
+# output: the tableaux of some inputs, as a list of [input,candidates,violations] (as yielded by get_tableaux), and the constraint names
+def get_tableaux(inputs,theory=None,constraints=None,active_edge=None,tiers=None,port=default_port):
+    parameters = tableau_parameters(inputs,theory,constraints,active_edge,tiers)
+    answer = json.loads(request('/tableaux',parameters,port))
+    return answer['tableaux'], answer['constraints']
+
+# output: the tableaux of some inputs as the text of an OTSoft file
+def get_otsoft(inputs,theory=None,constraints=None,active_edge=None,tiers=None,port=default_port):
+    parameters = tableau_parameters(inputs,theory,constraints,active_edge,tiers)
+    parameters['format'] = 'otsoft'
+    return request('/tableaux',parameters,port)
+
+# Read grid tiers given as a comma-separated list (for --tiers), e.g. 1,2
+def parse_tiers(text):
+    try:
+        tiers = [int(tier) for tier in text.split(',')]
+    except ValueError:
+        raise argparse.ArgumentTypeError('grid tiers are a comma-separated list of 1 and 2, e.g. 1,2, not ' + repr(text))
+    if not tiers or set(tiers) - set([1,2]):
+        raise argparse.ArgumentTypeError('grid tiers are a comma-separated list of 1 and 2, e.g. 1,2, not ' + repr(text))
+    return tiers
+
+def tableau_parameters(inputs,theory,constraints,active_edge,tiers):
+    parameters = {'inputs':','.join(inputs)}
+    if theory != None:
+        parameters['theory'] = theory
+    if constraints != None:
+        parameters['constraints'] = ','.join(constraints)
+    if active_edge != None:
+        parameters['active_edge'] = '1' if active_edge else '0'
+    if tiers != None:
+        parameters['tiers'] = ','.join([str(tier) for tier in tiers])
+    return parameters
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Get tableaux from the tableau service (python service.py).')
+    parser.add_argument('inputs',nargs='*',help='inputs, e.g. oDooo')
+    parser.add_argument('--theory',help='a theory of constraints.py (Gordon, AE, HeinzEtAl; default: Gordon)')
+    parser.add_argument('--constraints',help='a comma-separated list of constraints, instead of a theory')
+    parser.add_argument('--active-edge',action='store_true',default=None,help='candidates with an active edge (default: only for the AE theory)')
+    parser.add_argument('--tiers',type=parse_tiers,help='grid levels of the candidates, e.g. 1,2 (default) or 1')
+    parser.add_argument('--json',action='store_true',help='print JSON instead of OTSoft lines')
+    parser.add_argument('--output',help='save the tableaux in an OTSoft file instead of printing them')
+    parser.add_argument('--port',type=int,default=default_port,help='port of the service (default: %(default)s)')
+    parser.add_argument('--stats',action='store_true',help='print the cache statistics of the service')
+    arguments = parser.parse_args()
+
+    try:
+        if arguments.stats:
+            print(json.dumps(json.loads(request('/stats',{},arguments.port)),indent=1))
+            sys.exit(0)
+        if not arguments.inputs:
+            parser.error('at least one input is needed')
+        theory = arguments.theory if arguments.theory != None or arguments.constraints != None else 'Gordon'
+        constraints = arguments.constraints.split(',') if arguments.constraints != None else None
+        if arguments.json:
+            tableaux, constraint_names = get_tableaux(arguments.inputs,theory,constraints,arguments.active_edge,arguments.tiers,arguments.port)
+            print(json.dumps({'constraints':constraint_names, 'tableaux':tableaux}))
+        else:
+            text = get_otsoft(arguments.inputs,theory,constraints,arguments.active_edge,arguments.tiers,arguments.port)
+            if arguments.output != None:
+                with open(arguments.output,'w') as file:
+                    file.write(text)
+                print('Saved ' + arguments.output)
+            else:
+                sys.stdout.write(text)
+    except TypeError as error:
+        print('Error: ' + str(error))
+        sys.exit(1)
+    except OSError as error:
+        print('Cannot reach the tableau service on port ' + str(arguments.port) + ' (start it with python service.py): ' + str(error))
+        sys.exit(1)
@@ -30,10 +30,10 @@ CON = {
         # Gradient alignment
         'AlignAll/L':None,                   # violations calculated without regex; For each stress, assign one * for every syllable separating the stress from the L edge
         'AlignAll/R':None,                   # violations calculated without regex; For each stress, assign one * for every syllable separating the stress from the R edge
-        'Align/L':'(?:(?<=^o)|(?<=^oo)|(?<=^ooo)|(?<=^oooo)|(?<=^ooooo)|(?<=^oooooo)|(?<=^@o)|(?<=^@oo)|(?<=^@ooo)|(?<=^@oooo)|(?<=^@ooooo)|(?<=^@oooooo))',       # For nearest stress; this must be done this way, because lookbehind can only scope over fixed-length sequences
+        'Align/L':None,                      # violations calculated without regex (lookbehind can only scope over fixed-length sequences); For nearest stress, assign one * for every syllable separating it from the L edge
         'Align/R':'o(?=o*@?$)',              # For nearest stress; can use the * quantifier here, because lookahead can also scope over non-fixed-length sequences
         'AlignPeak/L':'s(?=.*S)',         
-        'AlignPeak/R':'((?<=S)s)|((?<=S.)s)|((?<=S..)s)|((?<=S...)s)|((?<=S....)s)|((?<=S.....)s)|((?<=S......)s)',         
+        'AlignPeak/R':None,                  # violations calculated without regex; Assign one * for every stress following the peak
         'AlignPeak_syl/L':None,              # violations calculated without regex; Assign one * for every syllable separating the peak from the L edge
         'AlignPeak_syl/R':None,              # violations calculated without regex; Assign one * for every syllable separating the peak from the R edge        
         
@@ -64,10 +64,10 @@ CON = {
 
         # Gradient alignment 
         'AlignAll/AE':None,             
-        'Align/AE':'((?:(?<=^@o)|(?<=^@oo)|(?<=^@ooo)|(?<=^@oooo)|(?<=^@ooooo)|(?<=^@oooooo))|(o(?=o*@$)))',     # For nearest stress
-        'G-*Lapse/AE':'((?:(?<=^@oo)|(?<=^@ooo)|(?<=^@oooo)|(?<=^@ooooo)|(?<=^@oooooo))|(o(?=oo*@$)))',          # For nearest stress
-        'G-*ExtLapse/AE':'((?:(?<=^@ooo)|(?<=^@oooo)|(?<=^@ooooo)|(?<=^@oooooo))|(o(?=ooo*@$)))',                # For nearest stress
-        'AlignPeak/AE':'(s(?=.*S[^@]*$))|((?<=S)s(?=.*@))|((?<=S.)s(?=.*@))|((?<=S..)s(?=.*@))|((?<=S...)s(?=.*@))|((?<=S....)s(?=.*@))|((?<=S.....)s(?=.*@))|((?<=S......)s(?=.*@))',     
+        'Align/AE':None,                # violations calculated without regex; For nearest stress, assign one * for every syllable separating it from the AE
+        'G-*Lapse/AE':None,             # violations calculated without regex; For nearest stress, assign one * for every syllable beyond the first separating it from the AE
+        'G-*ExtLapse/AE':None,          # violations calculated without regex; For nearest stress, assign one * for every syllable beyond the second separating it from the AE
+        'AlignPeak/AE':None,            # violations calculated without regex; Assign one * for every stress separating the peak from the AE (from the L edge if there is no AE)
         'AlignPeak_syl/AE':None,     
 
         # Stress repulsion
@@ -172,3 +172,68 @@ constraints_HeinzEtAl = [
                 'DPS',                          # Added, not in original paper
                 'REP',                          # Added, not in original paper
                 ]
+
+
+
+# Theories by name (for running several theories at once, see main.py --theories), and the theories whose candidates have an active edge (@)
+theories = {
+                'Gordon':constraints_Gordon,
+                'AE':constraints_AE,
+                'HeinzEtAl':constraints_HeinzEtAl,
+                }
+active_edge_theories = ['AE']
+
+
+
+# Mirror images of constraints: the constraint that assigns the same violations to the reversed surface form (e.g. Align/L to oooS as Align/R to Sooo);
+# reversing a string also moves the active edge to the other side (@Soo <-> ooS@)
+# Each pair is listed once (the mirror of the mirror is the constraint itself), and symmetric constraints are their own mirror
+# Constraints that are not listed have no mirror (e.g. *InitialClash, Lapse-near-Left, NonInit - the mirror of NonFin only without an active edge - or AlignPeak/AE - symmetric only with an active edge),
+# and are always computed directly; python mirror.py checks these declarations, and lists undeclared mirrors (see mirror.py)
+MIRROR = {
+                # Pairs
+                'Stress/L':'Stress/R',
+                '*Lapse/L':'*Lapse/R',
+                '*ExtLapse/L':'*ExtLapse/R',
+                'LeftMost':'RightMost',
+                'AlignAll/L':'AlignAll/R',
+                'Align/L':'Align/R',
+                'AlignPeak/L':'AlignPeak/R',
+                'AlignPeak_syl/L':'AlignPeak_syl/R',
+                'AE/L':'AE/R',
+                'NoInitialStress':'NonFin',
+                'FirstStressLeft':'LastStressRight',
+
+                # Symmetric
+                '*Clash':'*Clash',
+                '*Lapse':'*Lapse',
+                '*Clash-at-Peak':'*Clash-at-Peak',
+                '*Lapse-not-at-Peak':'*Lapse-not-at-Peak',
+                '*Lapse-in-Trough':'*Lapse-in-Trough',
+                '*ExtClash':'*ExtClash',
+                '*ExtLapse':'*ExtLapse',
+                'Stress/Edges':'Stress/Edges',
+                'Align/Edges':'Align/Edges',
+                'Culminativity':'Culminativity',
+                'OneStress':'OneStress',
+                'NoStress':'NoStress',
+                '*InternalClash':'*InternalClash',
+                'H_*Clash-at-Peak':'H_*Clash-at-Peak',
+                '*StressAE':'*StressAE',
+                '*LapseAE':'*LapseAE',
+                '*ExtLapseAE':'*ExtLapseAE',
+                'PeakAE':'PeakAE',
+                'AlignAll/AE':'AlignAll/AE',
+                'Align/AE':'Align/AE',
+                'G-*Lapse/AE':'G-*Lapse/AE',
+                'G-*ExtLapse/AE':'G-*ExtLapse/AE',
+                'AlignPeak_syl/AE':'AlignPeak_syl/AE',
+                'NonPeriph/AE':'NonPeriph/AE',
+                'ExtNonPeriph/AE':'ExtNonPeriph/AE',
+                'G-ExtNonPeriph/AE':'G-ExtNonPeriph/AE',
+                'A-ExtNonPeriph/AE':'A-ExtNonPeriph/AE',
+
+                # Faithfulness: the reversed candidate of the reversed input has the same violations
+                'DPS':'DPS',
+                'REP':'REP',
+                }
@@ -0,0 +1,138 @@
+# This file defines the pruning of harmonically bounded candidates from tableaux, after scoring and before writing them for OTSoft
+# A candidate is simply harmonically bounded if another candidate of the same tableau has at most as many violations of every constraint,
+# and fewer of at least one; such a candidate cannot win under any ranking
+# A candidate is collectively harmonically bounded if no ranking makes it optimal, even though no single candidate bounds it
+# (checked with Recursive Constraint Demotion on its comparisons with the other candidates)
+# Candidates with identical violations are never pruned because of each other (they tie under every ranking)
+
+import time
+from operator import le
+
+
+# Find the simply harmonically bounded candidates of a tableau
+# Candidates are sorted by their total number of violations, since a candidate can only be bounded by a candidate with fewer violations in total;
+# each violation vector is compared only with the unbounded vectors found so far (by transitivity, a bounded vector is also bounded by an unbounded one)
+# output: a list of booleans, one for each candidate (True = bounded)
+def simply_bounded(violation_vectors):
+    vectors = sorted(set([tuple(violations) for violations in violation_vectors]),key=sum)
+    unbounded = []      # (total, vector)
+    bounded = set()
+    for vector in vectors:
+        total = sum(vector)
+        for other_total, other in unbounded:
+            if other_total < total and all(map(le,other,vector)):
+                bounded.add(vector)
+                break
+        else:
+            unbounded.append((total,vector))
+    return [tuple(violations) in bounded for violations in violation_vectors]
+
+
+# Elementary ranking condition of a winner over a loser, as two bit masks over the constraints:
+# W (constraints that prefer the winner) and L (constraints that prefer the loser)
+def erc(winner,loser):
+    w = 0
+    l = 0
+    for i in range(len(winner)):
+        if winner[i] < loser[i]:
+            w |= 1 << i
+        elif winner[i] > loser[i]:
+            l |= 1 << i
+    return w, l
+
+# Recursive Constraint Demotion (Tesar & Smolensky): rank first the constraints that prefer no loser, remove the comparisons they decide, and repeat
+# ercs: an iterable of (W mask, L mask), as returned by erc
+# output: a stratified ranking (a list of strata, each a list of constraint indices), or None if the ercs are inconsistent
+def rcd(ercs,number_of_constraints):
+    strata = rcd_masks(ercs,number_of_constraints)
+    if strata == None:
+        return None
+    return [[i for i in range(number_of_constraints) if stratum >> i & 1] for stratum in strata]
+
+# Same as rcd, with each stratum as a bit mask of constraints
+def rcd_masks(ercs,number_of_constraints):
+    remaining_ercs = [(w,l) for w,l in ercs if w or l]
+    unranked = (1 << number_of_constraints) - 1
+    strata = []
+    while remaining_ercs:
+        preferring_losers = 0
+        for w, l in remaining_ercs:
+            preferring_losers |= l
+        stratum = unranked & ~preferring_losers
+        if not stratum:
+            return None
+        strata.append(stratum)
+        unranked &= ~stratum
+        remaining_ercs = [(w,l) for w,l in remaining_ercs if not w & stratum]
+    if unranked:
+        strata.append(unranked)
+    return strata
+
+# Does a stratified ranking (as returned by rcd_masks) satisfy an erc under every refinement:
+# the highest stratum with a constraint that prefers either candidate must prefer only the winner
+def satisfies(strata,w,l):
+    for stratum in strata:
+        if stratum & (w|l):
+            return not stratum & l
+    return True
+
+
+# Find the collectively harmonically bounded candidates among candidates that are not simply bounded
+# output: a list of booleans, one for each candidate (True = bounded)
+def collectively_bounded(violation_vectors):
+    vectors = list(set([tuple(violations) for violations in violation_vectors]))
+    number_of_constraints = len(vectors[0]) if vectors else 0
+    bounded = set()
+    for vector in vectors:
+        if rcd([erc(vector,other) for other in vectors if other != vector],number_of_constraints) == None:
+            bounded.add(vector)
+    return [tuple(violations) in bounded for violations in violation_vectors]
+
+
+# Remove the harmonically bounded candidates of a tableau
+# collective: also remove the collectively bounded candidates (slower)
+# output: candidates, violations, number of simply bounded candidates, number of collectively bounded candidates
+def prune_tableau(cands,violation_vectors,collective=False):
+    bounded = simply_bounded(violation_vectors)
+    number_simply_bounded = sum(bounded)
+    cands = [cand for cand,is_bounded in zip(cands,bounded) if not is_bounded]
+    violation_vectors = [violations for violations,is_bounded in zip(violation_vectors,bounded) if not is_bounded]
+    number_collectively_bounded = 0
+    if collective:
+        bounded = collectively_bounded(violation_vectors)
+        number_collectively_bounded = sum(bounded)
+        cands = [cand for cand,is_bounded in zip(cands,bounded) if not is_bounded]
+        violation_vectors = [violations for violations,is_bounded in zip(violation_vectors,bounded) if not is_bounded]
+    return cands, violation_vectors, number_simply_bounded, number_collectively_bounded
+
+# Prune a stream of tableaux ([input,candidates,violations], as yielded by get_tableaux)
+# report: an optional list, to which [input, number of candidates, simply bounded, collectively bounded] is added for each input
+# timings: an optional dictionary, to which the time spent pruning is added (as 'pruning'); calls: likewise, the number of pruned tableaux
+def prune_tableaux(tableaux,collective=False,report=None,timings=None,calls=None):
+    for input, cands, violation_vectors in tableaux:
+        stage_start = time.perf_counter()
+        number_of_candidates = len(cands)
+        cands, violation_vectors, number_simply_bounded, number_collectively_bounded = prune_tableau(cands,violation_vectors,collective)
+        if report != None:
+            report.append([input,number_of_candidates,number_simply_bounded,number_collectively_bounded])
+        if timings != None:
+            timings['pruning'] = timings.get('pruning',0.0) + time.perf_counter()-stage_start
+        if calls != None:
+            calls['pruning'] = calls.get('pruning',0) + 1
+        yield [input,cands,violation_vectors]
+
+# Write the number of pruned candidates per input into a tab-separated file
+def write_pruning_report(file_name,report):
+    with open(file_name,'w') as file:
+        file.write('input\tcandidates\tsimply bounded\tcollectively bounded\tremaining\n')
+        for input, number_of_candidates, number_simply_bounded, number_collectively_bounded in report:
+            remaining = number_of_candidates - number_simply_bounded - number_collectively_bounded
+            file.write(input + '\t' + str(number_of_candidates) + '\t' + str(number_simply_bounded) + '\t' + str(number_collectively_bounded) + '\t' + str(remaining) + '\n')
+
+# A one-line summary of a pruning report
+def summarize_pruning(report):
+    number_of_candidates = sum([row[1] for row in report])
+    number_simply_bounded = sum([row[2] for row in report])
+    number_collectively_bounded = sum([row[3] for row in report])
+    return ('Pruned ' + str(number_simply_bounded+number_collectively_bounded) + ' of ' + str(number_of_candidates) + ' candidates ('
+            + str(number_simply_bounded) + ' simply bounded, ' + str(number_collectively_bounded) + ' collectively bounded)')
@@ -7,11 +7,16 @@
 # 4. Prints tableaux (compatible with OTSoft) with all of the above information
 
 import random
+import re
 import os
 import sys
+import time
+import argparse
+import functools
 from datetime import datetime   # for time stamp in file name
 from constraints import *
-from utils import *
+from representation_generator import *
+from tableaux import *
 
 
 # Parameters: set by user
@@ -19,74 +24,251 @@ constraints = constraints_Gordon      # Variable (list). Corresponds to one of t
 min_input_length = 2                  # Integer. Minimal number of syllables in an input
 max_input_length = 7                  # Integer. Maximal number of syllables in an input
 grid_tiers = [1,2]                    # List of integers. Number of grid levels in candidates: [1] for x1 level, [1,2] for x1+x2 levels, [2] for only single-stress candidates
-DPS = True                            # Boolean. Determines whether to genearte additional inputs with a stress-attracting property on some syllable (maximally one per input).
-REP = False                           # Boolean. Determines whether to genearte additional inputs with a stress-repelling property on some syllable (maximally one per input).
-
-
-# Automatic setting of a boolean parameter based on the selected constraint set.
-# Determines whether candidates have an active edge (@ diacritic).
-if constraints == constraints_AE or constraints == constraints_AE_AlignEdges:
-    active_edge_Gen = True                  
-else:  
-    active_edge_Gen = False                  
-
-
-### Generate inputs based on user specifications
-inputs = get_inputs(min_input_length,max_input_length,DPS,REP)
-
-
-### Generate candidates for each inputs based on user specifications
-inp_and_cands = []
-for i in range(0,len(inputs)):
-    cands = get_candidates(input=inputs[i],tiers=grid_tiers,active_edge=active_edge_Gen)
-    inp_and_cands.append([inputs[i],cands])
-
-
-### Generate tableaux (for OTSoft)
-# "tableaux" is a list of lists, each list corresponds to a single candidate and has the format [input,candidate,[violation1,violation2,...violationn]] 
-tableaux = []
-
-for pair in inp_and_cands:
-    input, cands = pair
-    for cand in cands:
-        cand_pair = [input,cand]
-        violations = count_violations(cand_pair,constraints)
-        tableaux.append([input,cand,violations])
-
-string_constraints = ''
-for constraint in constraints:
-    string_constraints = string_constraints + '  ' + constraint
-print(string_constraints)
-for tableau in tableaux[:50]:
-    print(tableau)
-
-
-# Print "tableaux" into a text file in OTSoft-compatible format
-current_datetime = datetime.now().strftime("%Y-%m-%d %H.%M.%S")
-file_name = current_datetime + ' ' + 'OTSoft input.txt'
-if not os.path.isdir('Inputs_OTSoft'):
-    os.mkdir("Inputs_OTSoft") # Create subdirectory
-os.chdir("Inputs_OTSoft") # Change the current working directory to "subdir" 
-with open(file_name,"w") as file:
-    # print two lines with constraint names
-    for i in range(0,2):
-        file.write('\t'+'\t')
-        for constraint in constraints:
-            file.write('\t' + str(constraint))
-        file.write('\n')
-    # print inputs, candidates, and constraint violations
-    current_input = ''
-    for candidate_line in tableaux:
-        input, surface, violations = candidate_line
-        violations = '\t'.join([str(i) for i in violations])
-        if candidate_line[0] == current_input:
-            file.write('\t' + surface + '\t\t'+ violations + '\n') 
+DPS = True                            # Boolean. Determines whether to genearte additional inputs with a stress-attracting property on some syllable.
+REP = False                           # Boolean. Determines whether to genearte additional inputs with a stress-repelling property on some syllable.
+max_DPS = 1                           # Integer. Maximal number of stress-attracting syllables per input (when DPS is True).
+max_REP = 1                           # Integer. Maximal number of stress-repelling syllables per input (when REP is True).
+backend = 'regex'                     # String. 'regex' scores each candidate with the compiled constraints; 'bitmask' scores all candidates of an input at once (requires NumPy, see bitmask_backend.py); 'automaton' scans each candidate once for all constraints (see automata.py); 'trie' scores the candidates of all lengths at once, extending shared prefixes one syllable at a time.
+workers = 1                           # Integer. Number of processes for building tableaux (1 = serial). Can also be set with --workers N.
+cache_dir = None                      # String or None. Directory of an on-disk violation cache (see violation_cache.py); None = no disk cache. Can also be set with --cache-dir DIR.
+
+
+# Command-line options override the parameters above
+def parse_arguments():
+    parser = argparse.ArgumentParser(description='Generate metrical stress tableaux in OTSoft format.')
+    parser.add_argument('--workers',type=int,default=workers,help='number of processes for building tableaux (default: %(default)s; 1 = serial)')
+    parser.add_argument('--cache-dir',default=cache_dir,help='directory of an on-disk violation cache; only new or changed constraints are computed (default: no cache)')
+    parser.add_argument('--clear-cache',action='store_true',help='delete all cached violations in the cache directory and exit')
+    parser.add_argument('--theories',nargs='+',metavar='NAME[:MIN-MAX]',help='batch mode: build the tableaux of several theories (Gordon, AE, HeinzEtAl; see theories in constraints.py) in one run, '
+                        + 'one OTSoft file per theory, optionally each with its own input lengths (e.g. Gordon:2-9; default: min_input_length-max_input_length)')
+    parser.add_argument('--prune',choices=['simple','collective'],help='remove harmonically bounded candidates before writing (simple: bounded by another candidate; collective: also bounded by a set of candidates), '
+                        + 'and save the number of pruned candidates per input next to the OTSoft file')
+    parser.add_argument('--typology',action='store_true',help='compute the factorial typology of the constraint set (of each theory, with --theories) instead of writing OTSoft files; '
+                        + 'the languages are saved in a text file')
+    parser.add_argument('--format',choices=['otsoft','binary'],help='otsoft: OTSoft text files (default); binary: compact binary files (see binary_tableaux.py), '
+                        + 'which can be converted into OTSoft text files with python binary_tableaux.py to-otsoft')
+    parser.add_argument('--value-bytes',type=int,choices=[1,2,4],help='with --format binary: bytes per violation value (default: the narrowest that fits the violations)')
+    parser.add_argument('--profile',action='store_true',help='time each stage and each constraint, print a table and save it as JSON next to the OTSoft file')
+    parser.add_argument('--sample-inputs',type=int,metavar='N',help='score a random sample of N inputs instead of all of them (for long words; see sampling.py)')
+    parser.add_argument('--sample-candidates',type=int,metavar='N',help='score a random sample of N candidates of each word length instead of all of them (for long words; see sampling.py)')
+    parser.add_argument('--seed',type=int,default=0,help='seed of the random samples; the same seed gives the same samples (default: %(default)s)')
+    parser.add_argument('--stratify',action='store_true',help='with --sample-candidates: draw the same number of candidates for each number of stresses and peak position')
+    parser.add_argument('--include',nargs='+',default=[],metavar='CANDIDATE',help='with --sample-candidates: candidates that are always scored (for inputs of their length), e.g. oSo')
+    parser.add_argument('--mirror',choices=['derive','validate'],help='derive: score only one of each pair of mirror-image candidates for the constraints declared as mirror images (see MIRROR in constraints.py), '
+                        + 'and derive the other by permuting the columns; validate: also score the derived candidates directly and stop if they differ')
+    arguments = parser.parse_args()
+    if arguments.cache_dir != None and not arguments.clear_cache and backend in ['bitmask','trie']:
+        parser.error('--cache-dir works with the regex and automaton backends, not with backend = ' + repr(backend))
+    if arguments.typology and (arguments.prune != None or arguments.format != None):
+        parser.error('--typology writes no tableaux, so it cannot be combined with --prune or --format')
+    if arguments.mirror != None and backend in ['bitmask','trie']:
+        parser.error('--mirror works with the regex and automaton backends, not with backend = ' + repr(backend))
+    if arguments.value_bytes != None and arguments.format != 'binary':
+        parser.error('--value-bytes only applies to --format binary')
+    if arguments.sample_inputs != None and arguments.sample_inputs < 1:
+        parser.error('--sample-inputs must be at least 1, not ' + str(arguments.sample_inputs))
+    if arguments.sample_candidates != None and arguments.sample_candidates < 1:
+        parser.error('--sample-candidates must be at least 1, not ' + str(arguments.sample_candidates) + ' (a tableau needs candidates)')
+    if arguments.theories:
+        try:
+            parse_theories(arguments.theories)
+        except TypeError as error:
+            parser.error('--theories: ' + str(error))
+    return arguments
+
+
+# Parse theories of the form NAME or NAME:MIN-MAX (e.g. Gordon:2-9)
+# output: a list of [name, min input length, max input length]
+def parse_theories(specifications):
+    parsed = []
+    for specification in specifications:
+        name, separator, lengths = specification.partition(':')
+        if name not in theories:
+            raise TypeError('There is no such theory: ' + name + ' (theories: ' + ', '.join(theories) + ')')
+        if separator:
+            match = re.fullmatch('([0-9]+)-([0-9]+)',lengths)
+            if match == None or not 1 <= int(match.group(1)) <= int(match.group(2)):
+                raise TypeError('Input lengths of ' + name + ' must be MIN-MAX, with 1 <= MIN <= MAX (e.g. ' + name + ':2-9), not ' + repr(lengths))
+            min_length, max_length = int(match.group(1)), int(match.group(2))
         else:
-            file.write(input + '\t' + surface + '\t\t' + violations + '\n')
-            file.write('\t' + surface + '\t\t'+ violations + '\n') # Repeating the first candidate in another line because of a bug in OTSoft
-            current_input = candidate_line[0]
+            min_length, max_length = min_input_length, max_input_length
+        parsed.append([name,min_length,max_length])
+    return parsed
+
+
+# Print the first candidate lines ([input,candidate,violations]) of a stream of tableaux as they pass through
+def print_first_candidates(tableaux,number_of_lines):
+    for input, cands, violation_vectors in tableaux:
+        for cand, violations in zip(cands,violation_vectors):
+            if number_of_lines > 0:
+                print([input,cand,violations])
+                number_of_lines = number_of_lines - 1
+        yield [input,cands,violation_vectors]
+
+
+def main():
+    arguments = parse_arguments()
+
+    if arguments.clear_cache:
+        from violation_cache import ViolationCache, default_cache_directory
+        cache = ViolationCache(arguments.cache_dir or default_cache_directory)
+        cache.clear()
+        cache.close()
+        print('Cleared the violation cache in ' + (arguments.cache_dir or default_cache_directory))
+        return
+
+    # Automatic setting of a boolean parameter based on the selected constraint set.
+    # Determines whether candidates have an active edge (@ diacritic).
+    if constraints == constraints_AE:
+        active_edge_Gen = True                  
+    else:  
+        active_edge_Gen = False                  
+
+
+    # Optional profile of the run (see profiler.py); when it is off, nothing is timed per constraint
+    profile = None
+    if arguments.profile:
+        import profiler
+        profile = profiler.Profile()
+        profiler.enable(profile)
+
+
+    # Batch mode: several theories, each with its own input lengths; inputs are generated once, for all of them
+    batch = None
+    min_length, max_length = min_input_length, max_input_length
+    if arguments.theories:
+        batch = parse_theories(arguments.theories)
+        min_length = min([theory_min_length for name, theory_min_length, theory_max_length in batch])
+        max_length = max([theory_max_length for name, theory_min_length, theory_max_length in batch])
+
+
+    ### Generate inputs based on user specifications
+    # With --sample-inputs, a seeded random sample of the same inputs (in the same order), drawn without generating all of them (see sampling.py)
+    stage_start = time.perf_counter()
+    if arguments.sample_inputs != None:
+        from sampling import sample_inputs
+        inputs = sample_inputs(random.Random(arguments.seed),arguments.sample_inputs,min_length,max_length,DPS,REP,max_DPS,max_REP)
+    else:
+        inputs = list(get_inputs(min_length,max_length,DPS,REP,max_DPS,max_REP))
+    timings = {'inputs':time.perf_counter()-stage_start, 'candidates':0.0, 'scoring':0.0, 'writing':0.0}
+    calls = {'inputs':1, 'candidates':0, 'scoring':0, 'writing':0}     # the number of calls of each stage, counted where it runs
+    cache_counts = {'hits':0, 'misses':0}
+    if arguments.prune != None:
+        from harmonic_bounding import prune_tableaux, write_pruning_report, summarize_pruning
+        timings['pruning'] = 0.0
+        calls['pruning'] = 0
+    current_datetime = datetime.now().strftime("%Y-%m-%d %H.%M.%S")
+    # Output format: OTSoft text files, or binary files with the same tableaux
+    if arguments.format == 'binary':
+        from binary_tableaux import BinaryWriter
+        writer, extension = functools.partial(BinaryWriter,value_bytes=arguments.value_bytes), '.ottb'
+    else:
+        writer, extension = OTSoftWriter, '.txt'
+    # With --sample-candidates, each word length gets a seeded random sample of its candidates (see sampling.py)
+    sampling = None
+    sampler = None
+    if arguments.sample_candidates != None:
+        from sampling import CandidateSampler
+        sampling = [arguments.sample_candidates,arguments.seed,arguments.stratify,arguments.include]
+        sampler = CandidateSampler(arguments.sample_candidates,grid_tiers,active_edge_Gen,arguments.seed,arguments.stratify,arguments.include)
+    if not os.path.isdir('Inputs_OTSoft'):
+        os.mkdir("Inputs_OTSoft") # Create subdirectory
+
+
+    ### Factorial typology (see typology.py): computed from the violations directly, input lengths from short to long
+    if arguments.typology:
+        from typology import factorial_typology, write_typology
+        if batch == None:
+            batch = [[None,min_input_length,max_input_length]]
+        stage_start = time.perf_counter()
+        for name, theory_min_length, theory_max_length in batch:
+            theory_constraints = constraints if name == None else theories[name]
+            theory_active_edge = active_edge_Gen if name == None else name in active_edge_theories
+            theory_inputs = sorted([input for input in inputs if theory_min_length <= len(input) <= theory_max_length],key=len)
+            theory_sampler = None
+            if sampling != None:
+                theory_sampler = CandidateSampler(sampling[0],grid_tiers,theory_active_edge,*sampling[1:])
+            tableaux = get_tableaux(theory_inputs,theory_constraints,grid_tiers,theory_active_edge,backend,arguments.workers,timings,arguments.cache_dir,cache_counts,profile,sampler=theory_sampler,mirror=arguments.mirror,calls=calls)
+            progress = lambda length, number_of_languages: print('Input length ' + str(length) + ': ' + str(number_of_languages) + ' languages')
+            typology = factorial_typology(tableaux,len(theory_constraints),arguments.workers,progress)
+            calls['typology'] = calls.get('typology',0) + 1
+            typology_file_name = os.path.join('Inputs_OTSoft',current_datetime + ' ' + 'typology' + ('' if name == None else ' ' + name) + '.txt')
+            write_typology(typology_file_name,theory_constraints,typology)
+            print(str(len(typology)) + ' languages' + ('' if name == None else ' (' + name + ')') + ', saved in ' + typology_file_name)
+        timings['typology'] = time.perf_counter()-stage_start-timings['candidates']-timings['scoring']
+        del timings['writing']
+        print_summary(arguments,timings,calls,cache_counts,profile,current_datetime)
+        return
+
+
+    ### Batch mode: one OTSoft file per theory
+    # Theories with the same active-edge setting are scored together over the union of their constraints (see write_theories in tableaux.py)
+    if batch != None:
+        theories_to_write = [[os.path.join('Inputs_OTSoft',current_datetime + ' ' + 'OTSoft input ' + name + extension),theories[name],name in active_edge_theories,theory_min_length,theory_max_length]
+                             for name, theory_min_length, theory_max_length in batch]
+        pruning_reports = {}
+        stage_start = time.perf_counter()
+        write_theories(inputs,theories_to_write,grid_tiers,backend,arguments.workers,timings,arguments.cache_dir,cache_counts,profile,arguments.prune,pruning_reports,writer,sampling,arguments.mirror,calls)
+        timings['writing'] = time.perf_counter()-stage_start-timings['candidates']-timings['scoring']-timings.get('pruning',0.0)
+        for theory in theories_to_write:
+            print('Saved ' + theory[0])
+            if arguments.prune != None:
+                write_pruning_report(theory[0].replace('OTSoft input','pruned').replace(extension,'.txt'),pruning_reports[theory[0]])
+                print(summarize_pruning(pruning_reports[theory[0]]))
+        print_summary(arguments,timings,calls,cache_counts,profile,current_datetime)
+        return
+
+
+    ### Generate candidates and tableaux (for OTSoft)
+    # Each tableau has the format [input,[candidate1,candidate2,...],[[violation1,violation2,...violationn],...]]
+    # Candidates are generated once per word length, and markedness violations once per surface form (see tableaux.py);
+    # with more than one worker, the inputs are scored in parallel, and the tableaux still come out in the order of the inputs
+    tableaux = get_tableaux(inputs,constraints,grid_tiers,active_edge_Gen,backend,arguments.workers,timings,arguments.cache_dir,cache_counts,profile,sampler=sampler,mirror=arguments.mirror,calls=calls)
+
+    string_constraints = ''
+    for constraint in constraints:
+        string_constraints = string_constraints + '  ' + constraint
+    print(string_constraints)
+    # Optionally remove harmonically bounded candidates (see harmonic_bounding.py)
+    pruning_report = []
+    if arguments.prune != None:
+        tableaux = prune_tableaux(tableaux,arguments.prune == 'collective',pruning_report,timings,calls)
+    tableaux = print_first_candidates(tableaux,50)
+
+
+    # Print tableaux into a text file in OTSoft-compatible format
+    # Tableaux flow from scoring into the file one at a time, so only one tableau is held in memory
+    file_name = current_datetime + ' ' + 'OTSoft input' + extension
+    stage_start = time.perf_counter()
+    with writer(os.path.join('Inputs_OTSoft',file_name),constraints) as tableau_writer:
+        for input, cands, violation_vectors in tableaux:
+            tableau_writer.write(input,cands,violation_vectors)
+            calls['writing'] += 1
+    timings['writing'] = time.perf_counter()-stage_start-timings['candidates']-timings['scoring']-timings.get('pruning',0.0)
+    if arguments.prune != None:
+        write_pruning_report(os.path.join('Inputs_OTSoft',current_datetime + ' ' + 'pruned.txt'),pruning_report)
+        print(summarize_pruning(pruning_report))
+    print_summary(arguments,timings,calls,cache_counts,profile,current_datetime)
 
 
+# Print the time spent in each stage, the disk cache hits and misses, and the profile (if any)
+def print_summary(arguments,timings,calls,cache_counts,profile,current_datetime):
+    # Print the time spent in each stage
+    print('Time per stage (seconds): ' + ', '.join([stage + ' ' + '%.3f' % timings[stage] for stage in timings]))
+    if arguments.cache_dir != None:
+        print('Violation cache: ' + str(cache_counts['hits']) + ' hits, ' + str(cache_counts['misses']) + ' misses')
 
+    # Print and save the profile, with the number of calls of each stage
+    if profile != None:
+        import profiler
+        profiler.disable()
+        for stage in timings:
+            profile.add_stage(stage,timings[stage],calls.get(stage,0))
+        print(profile.table())
+        profile_file_name = os.path.join('Inputs_OTSoft',current_datetime + ' ' + 'profile.json')
+        profile.save(profile_file_name)
+        print('Saved the profile in ' + profile_file_name)
 
 
+if __name__ == '__main__':
+    main()
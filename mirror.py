@@ -0,0 +1,78 @@
+# This file defines the left-right mirror symmetry of constraints (see MIRROR in constraints.py)
+# The candidates of a word length are closed under reversal (the reversed string of a candidate is also a candidate, with the active edge on the other side),
+# and a constraint with a declared mirror assigns to a candidate the violations that its mirror assigns to the reversed candidate
+# So the markedness violations of a candidate can be derived from those of its reversed candidate by permuting the columns (see ConstraintSet);
+# only the constraints without a mirror in the constraint set are computed for both
+# Faithfulness constraints (DPS, REP) are mirrors of themselves for the reversed candidate of the reversed input, so the whole tableau of an input
+# can be derived from the tableau of its reversed input (see derive_tableau in tableaux.py)
+#
+# Usage: python mirror.py [max_length] - checks every declared mirror against count_violations for lengths 2-max_length,
+# and lists the constraints without a declared mirror that behave as mirrors of each other (candidates for MIRROR)
+
+import sys
+from constraints import *
+from representation_generator import *
+
+
+# The mirror image of a constraint, or None if none is declared
+def get_mirror(constraint):
+    if constraint in MIRROR:
+        return MIRROR[constraint]
+    for other, mirror in MIRROR.items():
+        if mirror == constraint:
+            return other
+    return None
+
+# For each constraint of a set, the index of its mirror image in the set (None if it has none, or if its mirror is not in the set)
+def get_mirror_columns(constraints):
+    constraints = list(constraints)
+    return [constraints.index(get_mirror(constraint)) if get_mirror(constraint) in constraints else None for constraint in constraints]
+
+
+# The violations of a constraint for each input and candidate of lengths 2-max_length (with and without an active edge), or the type of the error it raises
+# (the input has no D or R syllables, except for the faithfulness constraints, which get every input with at most one D and one R syllable)
+def get_violations(constraint,max_length):
+    input_dependent = getattr(compile_constraint(constraint),'input_dependent',False)
+    violations = {}
+    for length in range(2,max_length+1):
+        inputs = get_inputs(length,length,input_dependent,input_dependent) if input_dependent else ['o'*length]
+        for input in inputs:
+            for tiers in [[1],[1,2],[2]]:
+                for active_edge in [False,True]:
+                    for surface in get_candidates(input,tiers,active_edge):
+                        try:
+                            violations[(input,surface)] = count_violations([input,surface],[constraint])[0]
+                        except (TypeError,ValueError) as error:
+                            violations[(input,surface)] = type(error)
+    return violations
+
+# Does a constraint assign the violations of another constraint to the reversed candidates of the reversed inputs
+def is_mirror(violations,mirror_violations):
+    return all([(input[::-1],surface[::-1]) in mirror_violations and violations[(input,surface)] == mirror_violations[(input[::-1],surface[::-1])]
+                for input,surface in violations])
+
+# output: the declared mirrors that do not hold (as [constraint, mirror]),
+# and the constraints without a declared mirror that behave as mirrors of some constraints (as [constraint, [constraints]])
+def check_mirrors(max_length=9):
+    constraints = [constraint for constraint in CON] + [constraint for theory in theories.values() for constraint in theory if constraint not in CON]
+    constraints = list(dict.fromkeys(constraints))
+    violations = {constraint:get_violations(constraint,max_length) for constraint in constraints}
+    wrong = [[constraint,get_mirror(constraint)] for constraint in constraints
+             if get_mirror(constraint) != None and not is_mirror(violations[constraint],violations[get_mirror(constraint)])]
+    undeclared = []
+    for constraint in constraints:
+        if get_mirror(constraint) == None:
+            mirrors = [other for other in constraints if is_mirror(violations[constraint],violations[other])]
+            if mirrors:
+                undeclared.append([constraint,mirrors])
+    return wrong, undeclared
+
+
+if __name__ == '__main__':
+    max_length = int(sys.argv[1]) if len(sys.argv) > 1 else 9
+    wrong, undeclared = check_mirrors(max_length)
+    for constraint, mirror in wrong:
+        print('Declared mirror does not hold: ' + constraint + ' <-> ' + mirror)
+    for constraint, mirrors in undeclared:
+        print('Undeclared mirror: ' + constraint + ' <-> ' + ', '.join(mirrors))
+    print(str(len(wrong)) + ' declared mirrors do not hold for lengths 2-' + str(max_length))
@@ -0,0 +1,99 @@
+# This file defines an optional profile of a run of the program (main.py --profile):
+# - wall time and number of calls of each stage (inputs, candidates, scoring, writing)
+# - cumulative time and number of calls of each constraint, wherever violations are computed (ConstraintSet, count_violations, the bitmask backend)
+# When profiling is off, nothing is timed: constraint sets keep their plain violation functions, and count_violations only checks whether a profile is active
+# The profile is printed as a text table, sorted by time, and saved as JSON
+
+import json
+import time
+import representation_generator
+
+
+class Profile:
+
+    def __init__(self):
+        self.stages = {}          # stage -> [seconds, calls]
+        self.constraints = {}     # constraint -> [seconds, calls]
+
+    def add_stage(self,stage,seconds,calls=1):
+        counter = self.stages.setdefault(stage,[0.0,0])
+        counter[0] += seconds
+        counter[1] += calls
+
+    def add_constraint(self,constraint,seconds,calls=1):
+        counter = self.constraints.setdefault(constraint,[0.0,0])
+        counter[0] += seconds
+        counter[1] += calls
+
+    # A version of a violation function that adds its time to the constraint (used by ConstraintSet)
+    def timed(self,constraint,scorer):
+        counter = self.constraints.setdefault(constraint,[0.0,0])
+        def timed_scorer(*arguments):
+            start = time.perf_counter()
+            value = scorer(*arguments)
+            counter[0] += time.perf_counter()-start
+            counter[1] += 1
+            return value
+        return timed_scorer
+
+    # Compute the violations of each constraint separately with count_violations, adding the time to each constraint
+    # (count_violations calls this while the profile is active; the profile is set aside meanwhile, so each constraint is computed as usual)
+    def count_violations(self,candidate,constraints):
+        violations = []
+        representation_generator.active_profile = None
+        try:
+            for constraint in constraints:
+                start = time.perf_counter()
+                violations.extend(representation_generator.count_violations(candidate,[constraint]))
+                self.add_constraint(constraint,time.perf_counter()-start)
+        finally:
+            representation_generator.active_profile = self
+        return violations
+
+    # The counters since the last call (for sending them from a worker process), which are then reset
+    def take(self):
+        counts = {'stages':{stage:list(counter) for stage,counter in self.stages.items()},
+                  'constraints':{constraint:list(counter) for constraint,counter in self.constraints.items()}}
+        for counter in list(self.stages.values()) + list(self.constraints.values()):
+            counter[0], counter[1] = 0.0, 0
+        return counts
+
+    # Add the counters of another profile (as returned by take)
+    def merge(self,counts):
+        for stage, (seconds, calls) in counts['stages'].items():
+            self.add_stage(stage,seconds,calls)
+        for constraint, (seconds, calls) in counts['constraints'].items():
+            self.add_constraint(constraint,seconds,calls)
+
+    # output: a dictionary that can be saved as JSON, with stages and constraints sorted by time (constraints that were never called are left out)
+    def report(self):
+        def rows(counters):
+            return [{'name':name, 'seconds':seconds, 'calls':calls, 'microseconds_per_call':(seconds/calls*1e6 if calls else 0.0)}
+                    for name,(seconds,calls) in sorted(counters.items(),key=lambda item: -item[1][0]) if calls]
+        return {'stages':rows(self.stages), 'constraints':rows(self.constraints),
+                'total_seconds':sum([seconds for seconds,calls in self.stages.values()])}
+
+    # output: the report as a text table
+    def table(self):
+        report = self.report()
+        lines = []
+        for title, rows, total in [('Stage',report['stages'],report['total_seconds']),
+                                   ('Constraint',report['constraints'],sum([row['seconds'] for row in report['constraints']]))]:
+            lines.append('%-24s %12s %7s %12s %14s' % (title,'seconds','%','calls','us per call'))
+            for row in rows:
+                share = row['seconds']/total*100 if total else 0.0
+                lines.append('%-24s %12.4f %7.1f %12d %14.2f' % (row['name'],row['seconds'],share,row['calls'],row['microseconds_per_call']))
+            lines.append('')
+        return '\n'.join(lines)
+
+    def save(self,file_name):
+        with open(file_name,'w') as file:
+            json.dump(self.report(),file,indent=1)
+
+
+# Profile every call of count_violations (until disable is called)
+def enable(profile):
+    representation_generator.active_profile = profile
+
+def disable():
+    representation_generator.active_profile = None
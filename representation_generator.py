@@ -5,6 +5,7 @@
 # 3. Compute constraint violations for each input-candidate pair, with a constraint set selected by the user
 
 import re
+import inspect
 import itertools
 from constraints import *
 
@@ -14,105 +15,107 @@ from constraints import *
 # D = syllable with a stress-attracting property (for "DPS")
 # R = syllable with a stress-repelling property (for "Repel")
 # For technical reasons make the simplification that DPS and REP are always a part of the input; in actuality but they are sometimes a derived property (likewise for syllabification)
-def get_inputs(min_length=2,max_length=7,dps=False,rep=False):
-    
-    inputs = []
+# max_dps and max_rep set the maximal number of D and R syllables in an input (the original setting is maximally one of each)
+# Inputs are yielded lazily, in the following (stable) order:
+# 1. plain inputs, then inputs with D syllables only, then inputs with R syllables only, then inputs with both D and R syllables
+# 2. within each group, by word length
+# 3. by the number of D syllables, and then by the number of R syllables
+# 4. by the positions of the D syllables and then of the R syllables, in lexicographic order (e.g. Doo, oDo, ooD)
+def get_inputs(min_length=2,max_length=7,dps=False,rep=False,max_dps=1,max_rep=1):
 
-    base_inputs = []
+    # inputs without any stress-attrcting or stress-repelling syllables
     for i in range(min_length,max_length+1):
-        # the basis for input generation -- one form per word length
-        input = ["o"]*i
-        base_inputs.append(input)
-        # inputs without any stress-attrcting or stress-repelling syllables
-        plain_input = ''.join(input)    
-        inputs.append(plain_input)
-
-    # Generate all possible permutations with one stress-attracting syllable
+        yield 'o'*i
+
+    # Generate all inputs with stress-attracting syllables
     if dps == True:
-        inputs_with_stress = base_inputs.copy()
-        for input in base_inputs:
-            current_input = input
-            current_input[0] = 'D'
-            D_inputs = [''.join(p) for p in itertools.permutations(current_input,len(input))]
-            inputs = inputs + list(set(D_inputs))
-    
-    # Generate all possible permutations with one stress-repelling syllable
+        for i in range(min_length,max_length+1):
+            for num_dps in range(1,max_dps+1):
+                yield from get_marked_inputs(i,num_dps,0)
+
+    # Generate all inputs with stress-repelling syllables
     if rep == True:
-        inputs_with_heavies = base_inputs.copy()
-        for input in base_inputs:
-            current_input = input
-            current_input[0] = 'R'
-            R_inputs = [''.join(p) for p in itertools.permutations(current_input,len(input))]
-            inputs = inputs + list(set(R_inputs))
-
-    # Generate all possible permutations with one stress-attracting and one stress-repelling syllable
+        for i in range(min_length,max_length+1):
+            for num_rep in range(1,max_rep+1):
+                yield from get_marked_inputs(i,0,num_rep)
+
+    # Generate all inputs with both stress-attracting and stress-repelling syllables
     if dps == True and rep == True:
-        inputs_with_heavies = base_inputs.copy()
-        for input in base_inputs:
-            current_input = input
-            current_input[0] = 'D'
-            current_input[1] = 'R'
-            DnR_inputs = [''.join(p) for p in itertools.permutations(current_input,len(input))]
-            inputs = inputs + list(set(DnR_inputs))
+        for i in range(min_length,max_length+1):
+            for num_dps in range(1,max_dps+1):
+                for num_rep in range(1,max_rep+1):
+                    yield from get_marked_inputs(i,num_dps,num_rep)
+
 
-    return inputs
+# Generate all inputs of a given length with exactly num_dps D syllables and num_rep R syllables
+# The special syllables are placed by position (no permutations), so each input is built once
+def get_marked_inputs(length,num_dps,num_rep):
+    for D_indeces in itertools.combinations(range(length),num_dps):
+        remaining_indeces = [i for i in range(length) if i not in D_indeces]
+        for R_indeces in itertools.combinations(remaining_indeces,num_rep):
+            input = ['o']*length
+            for index in D_indeces:
+                input[index] = 'D'
+            for index in R_indeces:
+                input[index] = 'R'
+            yield ''.join(input)
 
 
 # Generate candidates with different stress patterns
-# The value of the digit denotes the level of stress, as follows:
-# 0 = unstressed, 1 = secondary stress , 2 = primary stress
+# Each candidate is a string, each character denotes a syllable, as follows:
+# o = unstressed, s = secondary stress (tier 1), S = primary stress (tier 2), @ = active edge (not a syllable)
+# Candidates are yielded lazily, each pattern exactly once, in the following (stable) order:
+# 1. by the number of tier 1 stresses (1, 2, ..., n)
+# 2. by the positions of the stresses, in lexicographic order (e.g. for n=3 and two stresses: ss-, s-s, -ss)
+# 3. by the position of the tier 2 stress among the tier 1 stresses, from left to right
+# 4. with an active edge: the right-active-edge candidate before the left-active-edge candidate
+# With tiers=[2], there is only one stress per candidate, ordered by its position from left to right
 def get_candidates(input,tiers,active_edge=False):
 
     # get number of syllables
     word_length = len(input)
 
+    for pattern in get_stress_patterns(word_length,tiers):
+        ## Create a right-active-edge and left-active-edge candidates for each pattern
+        if active_edge:
+            ActiveEdge = '@'
+            yield pattern+ActiveEdge
+            yield ActiveEdge+pattern
+        else:
+            yield pattern
+
+
+# Generate the stress patterns (without active edges) for a word length, in the order described in get_candidates
+# Stress positions are placed directly (via itertools.combinations), so each pattern is built once and no duplicates are removed
+def get_stress_patterns(word_length,tiers):
+
     ## get all possible stress assignments for tier 1
     if 1 in tiers:
-        tier_1_patterns = []
-        current_stress = ['o']*word_length    # create a list of n repetitions of '0'
-        for i in range(0,word_length):
-            current_stress[i] = 's'
-            new_stress_permutations = [''.join(p) for p in itertools.permutations(current_stress,word_length)]
-            tier_1_patterns = tier_1_patterns + new_stress_permutations
-        tier_1_patterns = list(set(tier_1_patterns))  # to remove duplicates
-    
-        # for each tier 1 pattern, get all positions of tier 2 stress
-        if 2 in tiers:
-            tier_2_patterns = []
-            for tier_1_pattern in tier_1_patterns:
-                # find the indeces of tier 1 stresses in the candidate
-                indeces_tier1 = [i.start() for i in re.finditer('s', tier_1_pattern)]
-                # crate all possible tier 2 locations based on existing tier 1 stresses
-                for index in indeces_tier1:
-                    tier_2_candidate = list(tier_1_pattern)
-                    tier_2_candidate[index] = 'S'
-                    tier_2_pattern = ''.join(map(str,tier_2_candidate))
-                    tier_2_patterns.append(tier_2_pattern)
-            patterns = tier_2_patterns
-        else:
-            patterns = tier_1_patterns
-    
+        for number_of_stresses in range(1,word_length+1):
+            for stressed_indeces in itertools.combinations(range(word_length),number_of_stresses):
+                tier_1_candidate = ['o']*word_length
+                for index in stressed_indeces:
+                    tier_1_candidate[index] = 's'
+
+                # for each tier 1 pattern, get all positions of tier 2 stress
+                if 2 in tiers:
+                    for index in stressed_indeces:
+                        tier_1_candidate[index] = 'S'
+                        yield ''.join(tier_1_candidate)
+                        tier_1_candidate[index] = 's'
+                else:
+                    yield ''.join(tier_1_candidate)
+
     ## Alternative: get only single-stress patterns
     else:
-        single_stress_patterns = []
         for i in range(0,word_length):
             current_stress = ['o']*word_length
             current_stress[i] = 'S'
-            new_stress_permutations = [''.join(current_stress)]
-            single_stress_patterns = single_stress_patterns + new_stress_permutations
-        patterns = single_stress_patterns 
-
-    ## Create a right-active-edge and left-active-edge candidates for each pattern
-    if active_edge:
-        patterns_with_active_edges = []
-        ActiveEdge = '@'
-        for i in range(0,len(patterns)):
-            patterns_with_active_edges.append(patterns[i]+ActiveEdge)
-            patterns_with_active_edges.append(ActiveEdge+patterns[i])
-        patterns = patterns_with_active_edges
-    
-    return patterns
+            yield ''.join(current_stress)
+
 
+# The profile of the current run, if profiling is on (see profiler.py)
+active_profile = None
 
 # Calculate violations of constraints for each candidate
 def count_violations(candidate,constraints):
@@ -120,6 +123,8 @@ def count_violations(candidate,constraints):
     # candidate: a list of two items – input, surface form
     # constraints: a list of constraints, each constraint is a list of four items: constraint name, regex, type (M for markedness or Faithfulmess), gradience (G for gradient, C for categorical)
     # output: a vector of integers, each correponds to the number of violations for one constraint for the present candidate
+    if active_profile != None:
+        return active_profile.count_violations(candidate,constraints)
     candidate_input, candidate_surface = candidate
     cand_surface_stripped = candidate_surface.replace('@','')  # For calculating violations while ignoring active edge character
     violations = []
@@ -142,7 +147,7 @@ def count_violations(candidate,constraints):
             num_violations = sum(distances)
         
         elif 'Align/Edges' in constraint: # Gradient, the sum of violations for AlignSome/R and AlignSome/L from Gordon
-            num_violations = len(re.findall(CON['Align/R'],candidate_surface)) + len(re.findall(CON['Align/L'],candidate_surface))
+            num_violations = len(re.findall(CON['Align/R'],candidate_surface)) + count_leading_unstressed(candidate_surface)
 
         elif 'DPS' in constraint:
             num_violations = 0
@@ -181,10 +186,41 @@ def count_violations(candidate,constraints):
             else:
                 raise TypeError('There is no such alignment constraints.')
 
+        # Gradient alignment over unbounded distances (cannot be expressed with fixed-length lookbehind)
+
+        elif 'Align/L' in constraint: # For nearest stress
+            num_violations = count_leading_unstressed(candidate_surface)
+
+        elif 'AlignPeak/R' in constraint:
+            num_violations = count_stresses_after_peak(candidate_surface)
+
+        elif 'Align/AE' in constraint: # For nearest stress
+            if candidate_surface[0] == '@':
+                num_violations = count_leading_unstressed(candidate_surface)
+            else:
+                num_violations = len(re.findall('o(?=o*@$)',candidate_surface))
+
+        elif 'G-*Lapse/AE' in constraint: # For nearest stress
+            if candidate_surface[0] == '@':
+                num_violations = count_leading_unstressed(candidate_surface) - 1
+            else:
+                num_violations = len(re.findall('o(?=oo*@$)',candidate_surface))
+
+        elif 'G-*ExtLapse/AE' in constraint: # For nearest stress
+            if candidate_surface[0] == '@':
+                num_violations = count_leading_unstressed(candidate_surface) - 2
+            else:
+                num_violations = len(re.findall('o(?=ooo*@$)',candidate_surface))
+
+        elif 'AlignPeak/AE' in constraint:
+            num_violations = len(re.findall('s(?=.*S[^@]*$)',candidate_surface))
+            if candidate_surface[-1] == '@':
+                num_violations = num_violations + count_stresses_after_peak(candidate_surface)
+
         # Heinz et al.'s constraints
 
         elif 'FirstStressLeft' in constraint: 
-            num_violations = (len(re.findall(CON['Align/L'],candidate_surface)) * 2) + len(re.findall('^[^S]*s',candidate_surface))
+            num_violations = (count_leading_unstressed(candidate_surface) * 2) + len(re.findall('^[^S]*s',candidate_surface))
 
         elif 'LastStressRight' in constraint: 
             num_violations = (len(re.findall(CON['Align/R'],candidate_surface)) * 2) + len(re.findall('s[^S]*$',candidate_surface))
@@ -214,4 +250,355 @@ def count_violations(candidate,constraints):
 
         violations.append(num_violations)
     
-    return violations
\ No newline at end of file
+    return violations
+
+
+# Number of unstressed syllables before the first stress (ignoring a left active edge), for any word length
+def count_leading_unstressed(candidate_surface):
+    return len(re.match('^@?(o*)',candidate_surface).group(1))
+
+# Number of secondary stresses following the peak, for any word length
+def count_stresses_after_peak(candidate_surface):
+    if 'S' not in candidate_surface:
+        return 0
+    return candidate_surface[candidate_surface.index('S'):].count('s')
+
+# A constraint set compiled once for repeated scoring
+# Each constraint name is resolved (with the same precedence as in count_violations) into a function with precompiled regular expressions,
+# so scoring a candidate involves no string dispatch and no pattern lookup in CON
+# Unknown constraint names raise an error when the set is built, rather than in the middle of a run
+# All constraints except the faithfulness constraints (DPS, REP) only look at the surface form, so their violations (the markedness columns)
+# are computed once per surface form and kept in a table shared by all inputs; only the faithfulness columns are computed per input
+# disk_cache: an optional ViolationCache (see violation_cache.py), from which markedness violations of unchanged constraint definitions are read back
+# mirror: None, 'derive' or 'validate' - derive the markedness violations of a surface form from those of its reversed form, if that is already in the table
+# (see mirror.py): the columns of constraints whose mirror is in the set are permuted, and only the other columns are computed;
+# 'validate' also computes the derived columns directly, and raises an error if they differ
+class ConstraintSet:
+
+    def __init__(self,constraints,cache=True,disk_cache=None,engine='regex',profile=None,mirror=None):
+        self.constraints = list(constraints)
+        self.scorers = [compile_constraint(constraint) for constraint in self.constraints]
+        self.definitions = [getattr(scorer,'definition',None) or inspect.getsource(scorer) for scorer in self.scorers]
+        self.faithfulness = [i for i in range(len(self.scorers)) if getattr(self.scorers[i],'input_dependent',False)]
+        self.markedness = [i for i in range(len(self.scorers)) if i not in self.faithfulness]
+        self.cache = cache
+        self.markedness_table = {}    # surface form -> violations, with 0 in the faithfulness columns
+        self.disk_cache = disk_cache
+        if disk_cache != None:
+            from violation_cache import fingerprint
+            self.fingerprints = [fingerprint(constraint,definition) for constraint,definition in zip(self.constraints,self.definitions)]
+        # engine: 'regex' scores each markedness constraint separately; 'automaton' scans each surface form once for all of them (see automata.py)
+        self.automaton = None
+        if engine == 'automaton':
+            from automata import Automaton
+            self.automaton = Automaton([self.constraints[i] for i in self.markedness])
+        # profile: time every violation function (see profiler.py); the automaton is timed as a whole
+        self.mirror = mirror
+        if mirror != None:
+            from mirror import get_mirror_columns
+            self.mirror_columns = get_mirror_columns(self.constraints)
+            self.unmirrored = [i for i in self.markedness if self.mirror_columns[i] == None]
+            self.mirror_permutation = [i if column == None else column for i,column in enumerate(self.mirror_columns)]   # the unmirrored columns are overwritten
+        if profile != None:
+            self.scorers = [profile.timed(constraint,scorer) for constraint,scorer in zip(self.constraints,self.scorers)]
+            if self.automaton != None:
+                self.automaton.score = profile.timed('automaton (' + str(len(self.markedness)) + ' constraints)',self.automaton.score)
+                self.automaton.score_lengths = profile.timed('automaton (' + str(len(self.markedness)) + ' constraints)',self.automaton.score_lengths)
+
+    # Same input and output as count_violations(candidate,constraints)
+    def count_violations(self,candidate):
+        candidate_input, candidate_surface = candidate
+        violations = self.markedness_violations(candidate)
+        if not self.faithfulness:
+            return list(violations)
+        violations = list(violations)
+        cand_surface_stripped = candidate_surface.replace('@','')  # For calculating violations while ignoring active edge character
+        for i in self.faithfulness:
+            violations[i] = max(0,self.scorers[i](candidate_input,candidate_surface,cand_surface_stripped))
+        return violations
+
+    # output: the markedness violations of a candidate (with 0 in the faithfulness columns), from the table if they are there
+    # (the returned list is the one kept in the table, so it must not be changed)
+    def markedness_violations(self,candidate):
+        candidate_input, candidate_surface = candidate
+        violations = self.markedness_table.get(candidate_surface)
+        if violations == None:
+            cand_surface_stripped = candidate_surface.replace('@','')  # For calculating violations while ignoring active edge character
+            mirrored = self.markedness_table.get(candidate_surface[::-1]) if self.mirror != None else None
+            if mirrored != None:
+                violations = self.derive_markedness(mirrored,candidate_input,candidate_surface,cand_surface_stripped)
+            else:
+                violations = self.score_markedness(candidate_input,candidate_surface,cand_surface_stripped)
+            if self.cache:
+                self.markedness_table[candidate_surface] = violations
+        return violations
+
+    # output: the markedness violations of a surface form (with 0 in the faithfulness columns)
+    def score_markedness(self,candidate_input,candidate_surface,cand_surface_stripped):
+        violations = [0]*len(self.scorers)
+        if self.disk_cache != None:
+            self.read_markedness(violations,candidate_input,candidate_surface,cand_surface_stripped)
+        elif self.automaton != None:
+            for i, value in zip(self.markedness,self.automaton.score(candidate_surface)):
+                violations[i] = value
+        else:
+            for i in self.markedness:
+                violations[i] = max(0,self.scorers[i](candidate_input,candidate_surface,cand_surface_stripped))
+        return violations
+
+    # Same output as score_markedness, from the markedness violations of the reversed surface form
+    def derive_markedness(self,mirrored,candidate_input,candidate_surface,cand_surface_stripped):
+        violations = [mirrored[i] for i in self.mirror_permutation]
+        for i in self.unmirrored:
+            violations[i] = max(0,self.scorers[i](candidate_input,candidate_surface,cand_surface_stripped))
+        if self.mirror == 'validate':
+            expected = self.score_markedness(candidate_input,candidate_surface,cand_surface_stripped)
+            if violations != expected:
+                wrong = [self.constraints[i] for i in self.markedness if violations[i] != expected[i]]
+                raise TypeError('Mirrored violations of ' + candidate_surface + ' differ from direct scoring for: ' + ', '.join(wrong) + ' (see MIRROR in constraints.py)')
+        return violations
+
+    # Fill in the markedness columns from the disk cache, computing (and storing) only the values that are not there
+    def read_markedness(self,violations,candidate_input,candidate_surface,cand_surface_stripped):
+        length = len(cand_surface_stripped)
+        for i in self.markedness:
+            column = self.disk_cache.get_column(self.fingerprints[i],length)
+            value = column.get(candidate_surface)
+            if value == None:
+                value = max(0,self.scorers[i](candidate_input,candidate_surface,cand_surface_stripped))
+                self.disk_cache.add(self.fingerprints[i],length,candidate_surface,value)
+                self.disk_cache.misses += 1
+            else:
+                self.disk_cache.hits += 1
+            violations[i] = value
+
+    # Compute the markedness violations of all candidates of lengths min_length-max_length at once, in one walk over their prefixes
+    # (automaton engine only, see score_lengths in automata.py), and keep them in the markedness table
+    def fill_markedness(self,min_length,max_length,tiers,active_edge=False):
+        for candidate_surface, values in self.automaton.score_lengths(min_length,max_length,tiers,active_edge).items():
+            violations = [0]*len(self.scorers)
+            for i, value in zip(self.markedness,values):
+                violations[i] = value
+            self.markedness_table[candidate_surface] = violations
+
+    # Drop the markedness violations of all surface forms, or only of those with a given number of syllables
+    def clear_cache(self,word_length=None):
+        if word_length == None:
+            self.markedness_table = {}
+        else:
+            self.markedness_table = {surface:violations for surface,violations in self.markedness_table.items() if len(surface.replace('@','')) != word_length}
+
+
+# Resolve a constraint name into a function of (input, surface, stripped surface) that returns the number of violations
+def compile_constraint(constraint):
+
+    if 'AlignAll' in constraint: # Gradient align calculating distance in *syllables* for *every stress*
+        if 'L' in constraint:
+            return align_all_left
+        elif 'R' in constraint:
+            return align_all_right
+        elif 'AE' in constraint:
+            return align_all_active_edge
+        else:
+            raise TypeError('There is no such alignment constraints.')
+
+    elif 'Align/Edges' in constraint: # Gradient, the sum of violations for AlignSome/R and AlignSome/L from Gordon
+        return align_edges
+
+    elif 'DPS' in constraint:
+        return faithfulness_violations('D','o')
+
+    elif 'REP' in constraint:
+        return faithfulness_violations('R','sS')
+
+    elif 'A-*Clash' in constraint:
+        return sum_of_patterns([CON['*Clash'],CON['*Clash-at-Peak']])
+
+    elif 'A-*Lapse' in constraint:
+        return sum_of_patterns([CON['*Lapse'],CON['*Lapse-not-at-Peak']])
+
+    elif 'AlignPeak_syl' in constraint: # Gradient align calculating distance in *syllables* for *the peak*
+        if 'L' in constraint:
+            return align_peak_left
+        elif 'R' in constraint:
+            return align_peak_right
+        elif 'AE' in constraint:
+            return align_peak_active_edge
+        else:
+            raise TypeError('There is no such alignment constraints.')
+
+    # Gradient alignment over unbounded distances
+
+    elif 'Align/L' in constraint:
+        return align_left
+
+    elif 'AlignPeak/R' in constraint:
+        return align_peak_stresses_right
+
+    elif 'Align/AE' in constraint:
+        return align_active_edge
+
+    elif 'G-*Lapse/AE' in constraint:
+        return lapse_active_edge
+
+    elif 'G-*ExtLapse/AE' in constraint:
+        return extended_lapse_active_edge
+
+    elif 'AlignPeak/AE' in constraint:
+        return align_peak_stresses_active_edge
+
+    # Heinz et al.'s constraints
+
+    elif 'FirstStressLeft' in constraint:
+        return first_stress_left
+
+    elif 'LastStressRight' in constraint:
+        return sum_of_patterns([CON['Align/R'],'s[^S]*$'],[2,1])
+
+    elif 'Clash-at-Initial' in constraint:
+        return sum_of_patterns(['(?<!^)(?=([sS][sS]))','^[sS][sS]'],[2,1])
+
+    elif 'Clash-near-Right' in constraint:
+        return sum_of_patterns(['(?=([sS][sS].*..$))','[sS][sS].$','[sS][sS]$'],[2,1,1])
+
+    elif 'Lapse-near-Left' in constraint:
+        return sum_of_patterns(['(?<!^..)(?=(oo))','^oo','^.oo'],[2,1,1])
+
+    elif 'Lapse-near-Right' in constraint:
+        return sum_of_patterns(['(?=(oo.*...$))','oo..$','oo.$','oo$'],[2,1,1,1])
+
+    elif 'H_*Clash-at-Peak' in constraint:
+        return sum_of_patterns(['(?=(sS|Ss))','(?=(ss))'],[2,1])
+
+    elif 'H_Lapse-at-Peak' in constraint:
+        return sum_of_patterns(['(?<!(S))(?=(oo[^S]))','(?=(ooS|Soo))'],[2,1])
+
+    elif constraint not in CON:
+        raise TypeError('There is no such constraint: ' + constraint)
+
+    elif CON[constraint] == None:
+        raise TypeError('There is no regular expression or violation function for ' + constraint)
+
+    else:
+        return sum_of_patterns([CON[constraint]])
+
+
+# Violation functions for the constraints that are not defined by a single regular expression
+def sum_of_patterns(patterns,weights=None):
+    compiled_patterns = [re.compile(pattern) for pattern in patterns]
+    if weights == None:
+        weights = [1]*len(patterns)
+    if len(compiled_patterns) == 1:
+        findall = compiled_patterns[0].findall
+        violations = lambda candidate_input,candidate_surface,cand_surface_stripped: len(findall(candidate_surface))
+    else:
+        pairs = list(zip([pattern.findall for pattern in compiled_patterns],weights))
+        violations = lambda candidate_input,candidate_surface,cand_surface_stripped: sum([len(findall(candidate_surface))*weight for findall,weight in pairs])
+    violations.definition = repr(list(zip(patterns,weights)))     # for fingerprinting the constraint (see violation_cache.py)
+    return violations
+
+def faithfulness_violations(input_symbol,surface_symbols):
+    def violations(candidate_input,candidate_surface,cand_surface_stripped):
+        if len(cand_surface_stripped) != len(candidate_input):
+            raise TypeError('Input and stripped candidate do not have identical length.')
+        return sum([1 for inp,surf in zip(candidate_input,cand_surface_stripped) if inp == input_symbol and surf in surface_symbols])
+    violations.input_dependent = True
+    violations.definition = inspect.getsource(faithfulness_violations) + repr((input_symbol,surface_symbols))
+    return violations
+
+def align_all_left(candidate_input,candidate_surface,cand_surface_stripped):
+    return sum([i for i in range(len(cand_surface_stripped)) if cand_surface_stripped[i] != 'o'])
+
+def align_all_right(candidate_input,candidate_surface,cand_surface_stripped):
+    return sum([len(cand_surface_stripped)-i-1 for i in range(len(cand_surface_stripped)) if cand_surface_stripped[i] != 'o'])
+
+def align_all_active_edge(candidate_input,candidate_surface,cand_surface_stripped):
+    if candidate_surface[0] == '@':
+        return align_all_left(candidate_input,candidate_surface,cand_surface_stripped)
+    elif candidate_surface[-1] == '@':
+        return align_all_right(candidate_input,candidate_surface,cand_surface_stripped)
+    else:
+        raise TypeError('There is a problem with AlignAll/AE.')
+
+def align_peak_left(candidate_input,candidate_surface,cand_surface_stripped):
+    return cand_surface_stripped.index('S')
+
+def align_peak_right(candidate_input,candidate_surface,cand_surface_stripped):
+    return len(cand_surface_stripped)-cand_surface_stripped.index('S')-1
+
+def align_peak_active_edge(candidate_input,candidate_surface,cand_surface_stripped):
+    if candidate_surface[0] == '@':
+        return align_peak_left(candidate_input,candidate_surface,cand_surface_stripped)
+    elif candidate_surface[-1] == '@':
+        return align_peak_right(candidate_input,candidate_surface,cand_surface_stripped)
+    else:
+        raise TypeError('There is a problem with AlignPeak/AE.')
+
+align_right_pattern = re.compile(CON['Align/R'])
+first_stress_pattern = re.compile('^[^S]*s')
+right_active_edge_patterns = [re.compile('o(?=o*@$)'),re.compile('o(?=oo*@$)'),re.compile('o(?=ooo*@$)')]
+peak_before_active_edge_pattern = re.compile('s(?=.*S[^@]*$)')
+
+def align_left(candidate_input,candidate_surface,cand_surface_stripped):
+    return count_leading_unstressed(candidate_surface)
+
+def align_edges(candidate_input,candidate_surface,cand_surface_stripped):
+    return len(align_right_pattern.findall(candidate_surface)) + count_leading_unstressed(candidate_surface)
+
+def align_peak_stresses_right(candidate_input,candidate_surface,cand_surface_stripped):
+    return count_stresses_after_peak(candidate_surface)
+
+# Unstressed syllables between the nearest stress and the active edge, beyond the first skipped ones (0 for Align/AE, 1 for G-*Lapse/AE, 2 for G-*ExtLapse/AE)
+def unstressed_at_active_edge(candidate_surface,skipped):
+    if candidate_surface[0] == '@':
+        return count_leading_unstressed(candidate_surface) - skipped
+    return len(right_active_edge_patterns[skipped].findall(candidate_surface))
+
+def align_active_edge(candidate_input,candidate_surface,cand_surface_stripped):
+    return unstressed_at_active_edge(candidate_surface,0)
+
+def lapse_active_edge(candidate_input,candidate_surface,cand_surface_stripped):
+    return unstressed_at_active_edge(candidate_surface,1)
+
+def extended_lapse_active_edge(candidate_input,candidate_surface,cand_surface_stripped):
+    return unstressed_at_active_edge(candidate_surface,2)
+
+def align_peak_stresses_active_edge(candidate_input,candidate_surface,cand_surface_stripped):
+    num_violations = len(peak_before_active_edge_pattern.findall(candidate_surface))
+    if candidate_surface[-1] == '@':
+        num_violations = num_violations + count_stresses_after_peak(candidate_surface)
+    return num_violations
+
+def first_stress_left(candidate_input,candidate_surface,cand_surface_stripped):
+    return count_leading_unstressed(candidate_surface)*2 + len(first_stress_pattern.findall(candidate_surface))
+
+
+# Definitions of the violation functions, for fingerprinting the constraints (see violation_cache.py):
+# the code of each function, with the code of the helpers and the regular expressions it uses (so editing CON['Align/R'] or count_leading_unstressed
+# changes the fingerprints of the constraints that depend on it)
+def define(function,dependencies=[]):
+    parts = [inspect.getsource(function)]
+    for dependency in dependencies:
+        if isinstance(dependency,re.Pattern):
+            parts.append(repr(dependency.pattern))
+        else:
+            parts.append(getattr(dependency,'definition',None) or inspect.getsource(dependency))
+    function.definition = '\n'.join(parts)
+
+define(count_leading_unstressed)
+define(count_stresses_after_peak)
+define(align_all_left)
+define(align_all_right)
+define(align_all_active_edge,[align_all_left,align_all_right])
+define(align_peak_left)
+define(align_peak_right)
+define(align_peak_active_edge,[align_peak_left,align_peak_right])
+define(align_left,[count_leading_unstressed])
+define(align_edges,[align_right_pattern,count_leading_unstressed])
+define(align_peak_stresses_right,[count_stresses_after_peak])
+define(unstressed_at_active_edge,[count_leading_unstressed]+right_active_edge_patterns)
+define(align_active_edge,[unstressed_at_active_edge])
+define(lapse_active_edge,[unstressed_at_active_edge])
+define(extended_lapse_active_edge,[unstressed_at_active_edge])
+define(align_peak_stresses_active_edge,[peak_before_active_edge_pattern,count_stresses_after_peak])
+define(first_stress_left,[count_leading_unstressed,first_stress_pattern])
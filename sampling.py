@@ -0,0 +1,252 @@
+# This file defines seeded random sampling of inputs and candidates, for words too long to enumerate
+# Samples are drawn uniformly from the lists that get_inputs and get_candidates enumerate, without generating those lists:
+# each item has a number (its position in the enumeration), which is computed from the item and turned back into the item directly
+# (by counting the items before it), so the cost of a sample depends on its size, not on the size of the space
+# Sampled items are returned in the order of the enumeration, and the same seed always gives the same sample
+# Candidates can be sampled by strata (the number of stresses and the position of the peak), with the same number of candidates from each stratum,
+# so that rare stress patterns are represented; given candidates can be added to every sample
+
+import random
+from math import comb
+
+
+## Combinations, in the lexicographic order of itertools.combinations
+
+# The position of a combination (sorted indices) among the combinations of k out of n
+def rank_combination(indices,n):
+    rank = 0
+    previous = -1
+    k = len(indices)
+    for i, index in enumerate(indices):
+        for skipped in range(previous+1,index):
+            rank += comb(n-skipped-1,k-i-1)
+        previous = index
+    return rank
+
+# The combination of k out of n at a position
+def unrank_combination(rank,n,k):
+    indices = []
+    index = 0
+    for i in range(k):
+        while comb(n-index-1,k-i-1) <= rank:
+            rank -= comb(n-index-1,k-i-1)
+            index += 1
+        indices.append(index)
+        index += 1
+    return indices
+
+
+## Candidates (see get_candidates and get_stress_patterns)
+
+# The number of stress patterns with a given number of stresses
+def count_patterns(word_length,tiers,number_of_stresses):
+    if 1 in tiers and 2 in tiers:
+        return comb(word_length,number_of_stresses)*number_of_stresses
+    if 1 in tiers:
+        return comb(word_length,number_of_stresses)
+    return word_length if number_of_stresses == 1 else 0
+
+def count_candidates(word_length,tiers,active_edge=False):
+    return sum([count_patterns(word_length,tiers,k) for k in range(1,word_length+1)]) * (2 if active_edge else 1)
+
+# The candidate at a position of get_candidates(input,tiers,active_edge), for an input of word_length syllables
+def unrank_candidate(rank,word_length,tiers,active_edge=False):
+    edge = None
+    if active_edge:
+        rank, edge = divmod(rank,2)
+    for k in range(1,word_length+1):
+        if rank < count_patterns(word_length,tiers,k):
+            break
+        rank -= count_patterns(word_length,tiers,k)
+    pattern = ['o']*word_length
+    if 1 in tiers:
+        if 2 in tiers:
+            rank, peak = divmod(rank,k)
+        for index in unrank_combination(rank,word_length,k):
+            pattern[index] = 's'
+        if 2 in tiers:
+            pattern[unrank_combination(rank,word_length,k)[peak]] = 'S'
+    else:
+        pattern[rank] = 'S'
+    pattern = ''.join(pattern)
+    if edge == None:
+        return pattern
+    return pattern+'@' if edge == 0 else '@'+pattern
+
+# The position of a candidate in get_candidates (the inverse of unrank_candidate)
+def rank_candidate(candidate,tiers,active_edge=False):
+    edge = None
+    if active_edge:
+        edge = 0 if candidate.endswith('@') else 1
+        candidate = candidate.replace('@','')
+    word_length = len(candidate)
+    stresses = [i for i in range(word_length) if candidate[i] in 'sS']
+    k = len(stresses)
+    if 1 in tiers:
+        rank = sum([count_patterns(word_length,tiers,fewer) for fewer in range(1,k)])
+        if 2 in tiers:
+            rank += rank_combination(stresses,word_length)*k + stresses.index(candidate.index('S'))
+        else:
+            rank += rank_combination(stresses,word_length)
+    else:
+        rank = candidate.index('S')
+    if edge == None:
+        return rank
+    return rank*2 + edge
+
+# A stratum: the candidates with a given number of stresses and peak position (peak None for candidates without a peak, with tiers=[1])
+# output: a list of (number of stresses, peak position, size)
+def get_strata(word_length,tiers,active_edge=False):
+    strata = []
+    for k in range(1,word_length+1):
+        if 2 in tiers:
+            for peak in range(word_length):
+                size = comb(word_length-1,k-1) if 1 in tiers else (1 if k == 1 else 0)
+                if size:
+                    strata.append((k,peak,size * (2 if active_edge else 1)))
+        else:
+            strata.append((k,None,comb(word_length,k) * (2 if active_edge else 1)))
+    return strata
+
+# The candidate at a position within a stratum (ordered by the positions of the non-peak stresses, and then by the active edge)
+def unrank_in_stratum(rank,word_length,tiers,active_edge,number_of_stresses,peak):
+    edge = None
+    if active_edge:
+        rank, edge = divmod(rank,2)
+    pattern = ['o']*word_length
+    if peak == None:
+        for index in unrank_combination(rank,word_length,number_of_stresses):
+            pattern[index] = 's'
+    else:
+        others = [i for i in range(word_length) if i != peak]
+        for index in unrank_combination(rank,word_length-1,number_of_stresses-1):
+            pattern[others[index]] = 's'
+        pattern[peak] = 'S'
+    pattern = ''.join(pattern)
+    if edge == None:
+        return pattern
+    return pattern+'@' if edge == 0 else '@'+pattern
+
+
+# Sample distinct positions in range(size), excluding some (the excluded positions are never drawn, and all others are equally likely)
+def sample_positions(generator,size,sample_size,excluded=()):
+    excluded = sorted(set(excluded))
+    positions = []
+    for position in generator.sample(range(size-len(excluded)),min(sample_size,size-len(excluded))):
+        for excluded_position in excluded:     # skip over the excluded positions
+            if excluded_position <= position:
+                position += 1
+        positions.append(position)
+    return positions
+
+
+# Draws the same candidate sample for every input of a length (so that tableaux of the same length share their candidates)
+# sample_size: number of candidates per length (all candidates if there are fewer)
+# seed: the seed of each length's sample is derived from it and from the length
+# stratify: draw the same number of candidates from each stratum (number of stresses, peak position), as far as the strata allow
+# include: candidates that are added to the sample of their length (if they are candidates of that length)
+class CandidateSampler:
+
+    def __init__(self,sample_size,tiers,active_edge=False,seed=0,stratify=False,include=()):
+        if sample_size < 1:
+            raise TypeError('A candidate sample needs at least one candidate, not ' + str(sample_size))
+        self.sample_size = sample_size
+        self.tiers = tiers
+        self.active_edge = active_edge
+        self.seed = seed
+        self.stratify = stratify
+        self.include = list(include)
+        self.samples = {}      # word length -> candidates
+
+    # output: the sampled candidates of a word length, in the order of get_candidates
+    def candidates(self,word_length):
+        if word_length not in self.samples:
+            generator = random.Random(str(self.seed) + ':' + str(word_length))
+            included = [candidate for candidate in self.include if self.is_candidate(candidate,word_length)]
+            included_ranks = set([rank_candidate(candidate,self.tiers,self.active_edge) for candidate in included])
+            total = count_candidates(word_length,self.tiers,self.active_edge)
+            if not self.stratify:
+                ranks = set(sample_positions(generator,total,self.sample_size,included_ranks)) | included_ranks
+            else:
+                ranks = set(included_ranks)
+                for (k, peak, size), stratum_sample_size in zip(get_strata(word_length,self.tiers,self.active_edge),self.allocate(word_length,generator)):
+                    for position in sorted(generator.sample(range(size),stratum_sample_size)):
+                        ranks.add(rank_candidate(unrank_in_stratum(position,word_length,self.tiers,self.active_edge,k,peak),self.tiers,self.active_edge))
+            self.samples[word_length] = [unrank_candidate(rank,word_length,self.tiers,self.active_edge) for rank in sorted(ranks)]
+        return self.samples[word_length]
+
+    # The number of candidates drawn from each stratum: equal shares, and what small strata cannot take is shared by the others;
+    # the candidates left over after the equal shares (fewer than the strata that can take more) go to strata drawn at random with the generator
+    def allocate(self,word_length,generator):
+        sizes = [size for k,peak,size in get_strata(word_length,self.tiers,self.active_edge)]
+        allocation = [0]*len(sizes)
+        remaining = min(self.sample_size,sum(sizes))
+        while remaining > 0:
+            open_strata = [i for i in range(len(sizes)) if allocation[i] < sizes[i]]
+            share = remaining//len(open_strata)
+            if share == 0:
+                for i in generator.sample(open_strata,remaining):
+                    allocation[i] += 1
+                break
+            for i in open_strata:
+                added = min(share,sizes[i]-allocation[i])
+                allocation[i] += added
+                remaining -= added
+        return allocation
+
+    # Is a surface form a candidate of a word length (under the tiers and active-edge setting of the sampler)
+    def is_candidate(self,candidate,word_length):
+        pattern = candidate
+        if self.active_edge:
+            if candidate.count('@') != 1 or not (candidate.startswith('@') or candidate.endswith('@')):
+                return False
+            pattern = candidate.replace('@','')
+        if len(pattern) != word_length or set(pattern) - set('osS'):
+            return False
+        if 1 in self.tiers and 2 in self.tiers:
+            return pattern.count('S') == 1
+        if 1 in self.tiers:
+            return 'S' not in pattern and 's' in pattern
+        return pattern.count('S') == 1 and 's' not in pattern
+
+
+## Inputs (see get_inputs)
+
+# The groups of inputs in the order of get_inputs: (word length, D syllables, R syllables), each with its number of inputs
+def get_input_groups(min_length,max_length,dps=False,rep=False,max_dps=1,max_rep=1):
+    groups = [(length,0,0) for length in range(min_length,max_length+1)]
+    if dps:
+        groups += [(length,d,0) for length in range(min_length,max_length+1) for d in range(1,max_dps+1)]
+    if rep:
+        groups += [(length,0,r) for length in range(min_length,max_length+1) for r in range(1,max_rep+1)]
+    if dps and rep:
+        groups += [(length,d,r) for length in range(min_length,max_length+1) for d in range(1,max_dps+1) for r in range(1,max_rep+1)]
+    return [(length,d,r,comb(length,d)*comb(length-d,r)) for length,d,r in groups]
+
+# The input at a position within a group (as in get_marked_inputs: by the positions of the D syllables, then of the R syllables)
+def unrank_input(rank,length,num_dps,num_rep):
+    D_rank, R_rank = divmod(rank,comb(length-num_dps,num_rep))
+    input = ['o']*length
+    D_indeces = unrank_combination(D_rank,length,num_dps)
+    for index in D_indeces:
+        input[index] = 'D'
+    remaining_indeces = [i for i in range(length) if i not in D_indeces]
+    for index in unrank_combination(R_rank,length-num_dps,num_rep):
+        input[remaining_indeces[index]] = 'R'
+    return ''.join(input)
+
+# A sample of the inputs of get_inputs (with the same arguments), in the order of get_inputs
+# generator: a random.Random object (e.g. random.Random(seed))
+def sample_inputs(generator,sample_size,min_length=2,max_length=7,dps=False,rep=False,max_dps=1,max_rep=1):
+    if sample_size < 0:
+        raise TypeError('The sample size cannot be negative: ' + str(sample_size))
+    groups = get_input_groups(min_length,max_length,dps,rep,max_dps,max_rep)
+    total = sum([size for length,d,r,size in groups])
+    inputs = []
+    for position in sorted(sample_positions(generator,total,sample_size)):
+        for length, d, r, size in groups:
+            if position < size:
+                inputs.append(unrank_input(position,length,d,r))
+                break
+            position -= size
+    return inputs
@@ -0,0 +1,212 @@
+# This file defines a resident local service that builds tableaux on request, for interactive use (see client.py)
+# A run of main.py pays for the imports, the compilation of the constraints and the generation of candidates every time;
+# the service does this once, and keeps in memory, with least-recently-used eviction:
+# - scorers (see TableauScorer in tableaux.py), one per constraint set and candidate setting, each with its compiled constraints,
+#   its candidates by word length and its table of markedness violations by surface form (for a limited number of word lengths per scorer)
+# - finished tableaux, by constraint set, candidate setting and input (up to a total number of candidate rows)
+# Inputs longer than a maximal length are refused, since a single long input can take minutes (and the memory of millions of candidates)
+# The service listens on localhost only, and answers HTTP GET requests:
+# /tableaux?inputs=oDooo,ooo&theory=AE       - the tableaux of some inputs, under a theory of constraints.py (Gordon, AE, HeinzEtAl)
+#           &constraints=Align/L,NonFin      - or under a list of constraints (instead of theory)
+#           &active_edge=1                   - candidates with an active edge (default: as in main.py, only for the theories in active_edge_theories)
+#           &tiers=1,2                       - grid levels of the candidates (default: 1,2)
+#           &format=otsoft                   - an OTSoft file (as written by main.py) instead of JSON
+# /stats                                     - the number of cached scorers and tableaux, and the cache hits and misses
+# Requests are answered one at a time, so the caches need no locking
+#
+# Usage: python service.py [--port PORT] [--backend BACKEND] [--max-length N] [--max-scorers N] [--max-lengths N] [--max-rows N] [--mirror derive|validate]
+
+import re
+import json
+import time
+import argparse
+from collections import OrderedDict
+from http.server import HTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+from constraints import *
+from tableaux import TableauScorer, format_otsoft_header, format_otsoft_tableau
+
+default_port = 8765
+
+
+# A dictionary with a maximal total size of its items (by default, each item has size 1), which drops the least recently used items when it is full
+# An item larger than the capacity is not kept
+class LRUCache:
+
+    def __init__(self,capacity):
+        self.capacity = capacity
+        self.items = OrderedDict()      # key -> [value, size]
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self,key):
+        if key not in self.items:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.items.move_to_end(key)
+        return self.items[key][0]
+
+    def put(self,key,value,size=1):
+        if key in self.items:
+            self.size -= self.items.pop(key)[1]
+        if size > self.capacity:
+            return
+        self.items[key] = [value,size]
+        self.size += size
+        while self.size > self.capacity:
+            evicted_value, evicted_size = self.items.popitem(last=False)[1]
+            self.size -= evicted_size
+            self.evictions += 1
+
+    def __len__(self):
+        return len(self.items)
+
+    def stats(self):
+        return {'items':len(self.items), 'size':self.size, 'capacity':self.capacity, 'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions}
+
+
+# Builds tableaux with warm caches (independent of HTTP, so it can also be used directly)
+# backend, mirror: as in get_tableaux
+# max_length: the longest input served (in syllables)
+# max_scorers: number of scorers kept; max_lengths: number of word lengths whose candidates and violations each scorer keeps
+# max_rows: total number of candidate rows in the kept tableaux
+class TableauService:
+
+    def __init__(self,backend='regex',max_scorers=8,max_rows=1000000,mirror=None,max_length=12,max_lengths=4):
+        if max_lengths < 1:
+            raise TypeError('Scorers must keep at least one word length')
+        self.backend = backend
+        self.mirror = mirror
+        self.max_length = max_length
+        self.max_lengths = max_lengths
+        self.scorers = LRUCache(max_scorers)        # (constraints, tiers, active edge) -> [TableauScorer, its word lengths from least to most recently used]
+        self.tableaux = LRUCache(max_rows)          # (constraints, tiers, active edge, input) -> [input,candidates,violations], sized by candidates
+
+    # output: the scorer of a constraint set and candidate setting, ready for inputs of a word length
+    # (the candidates and violations of its least recently used word length are dropped if it has too many)
+    def get_scorer(self,constraints,tiers,active_edge,word_length):
+        key = (tuple(constraints),tuple(tiers),active_edge)
+        entry = self.scorers.get(key)
+        if entry == None:
+            entry = [TableauScorer(constraints,tiers,active_edge,self.backend,mirror=self.mirror),OrderedDict()]     # fails here on unknown constraint names
+            self.scorers.put(key,entry)
+        scorer, lengths = entry
+        lengths[word_length] = True
+        lengths.move_to_end(word_length)
+        while len(lengths) > self.max_lengths:
+            scorer.forget_length(lengths.popitem(last=False)[0])
+        return scorer
+
+    # output: [input,candidates,violations], as yielded by get_tableaux
+    def tableau(self,input,constraints,tiers=[1,2],active_edge=False):
+        if not re.fullmatch('[oDR]+',input):
+            raise TypeError('An input is a string of o, D and R syllables, not ' + repr(input))
+        if len(input) > self.max_length:
+            raise TypeError('Inputs of more than ' + str(self.max_length) + ' syllables are not served (see --max-length): ' + input)
+        key = (tuple(constraints),tuple(tiers),active_edge,input)
+        tableau = self.tableaux.get(key)
+        if tableau == None:
+            scorer = self.get_scorer(constraints,tiers,active_edge,len(input))
+            tableau = [input,scorer.get_candidates(input),scorer.score(input)]
+            self.tableaux.put(key,tableau,len(tableau[1]))
+        return tableau
+
+    def stats(self):
+        return {'scorers':self.scorers.stats(), 'tableaux':self.tableaux.stats()}
+
+
+# Read the constraint set and candidate setting of a request (the query parameters, see the top of this file)
+# output: constraints, tiers, active edge
+def parse_query(query):
+    if 'theory' in query:
+        name = query['theory'][0]
+        if name.startswith('constraints_'):
+            name = name[len('constraints_'):]
+        if name not in theories:
+            raise TypeError('There is no such theory: ' + name + ' (theories: ' + ', '.join(theories) + ')')
+        constraints = theories[name]
+        active_edge = name in active_edge_theories
+    elif 'constraints' in query:
+        constraints = query['constraints'][0].split(',')
+        active_edge = False
+    else:
+        raise TypeError('A request needs a theory or a list of constraints')
+    if 'active_edge' in query:
+        active_edge = query['active_edge'][0] in ['1','true','True']
+    tiers = [int(tier) for tier in query.get('tiers',['1,2'])[0].split(',')]
+    return constraints, tiers, active_edge
+
+
+class RequestHandler(BaseHTTPRequestHandler):
+
+    service = None      # set by serve
+    quiet = True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        query = parse_qs(url.query)
+        start = time.perf_counter()
+        try:
+            if url.path == '/stats':
+                self.respond(200,'application/json',json.dumps(self.service.stats()))
+            elif url.path == '/tableaux':
+                constraints, tiers, active_edge = parse_query(query)
+                inputs = [input for input in query.get('inputs',[''])[0].split(',') if input]
+                tableaux = [self.service.tableau(input,constraints,tiers,active_edge) for input in inputs]
+                if query.get('format',['json'])[0] == 'otsoft':
+                    text = format_otsoft_header(constraints) + ''.join([format_otsoft_tableau(*tableau) for tableau in tableaux])
+                    self.respond(200,'text/plain; charset=utf-8',text)
+                else:
+                    self.respond(200,'application/json',json.dumps({'constraints':list(constraints), 'tableaux':tableaux,
+                                                                    'milliseconds':(time.perf_counter()-start)*1000}))
+            else:
+                self.respond(404,'application/json',json.dumps({'error':'Unknown path: ' + url.path + ' (paths: /tableaux, /stats)'}))
+        except (TypeError,ValueError,KeyError) as error:
+            self.respond(400,'application/json',json.dumps({'error':str(error)}))
+
+    def respond(self,status,content_type,body):
+        body = body.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type',content_type)
+        self.send_header('Content-Length',str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self,format,*arguments):
+        if not self.quiet:
+            BaseHTTPRequestHandler.log_message(self,format,*arguments)
+
+
+# Answer requests on localhost until interrupted
+def serve(service,port=default_port,quiet=True):
+    RequestHandler.service = service
+    RequestHandler.quiet = quiet
+    server = HTTPServer(('127.0.0.1',port),RequestHandler)
+    print('Serving tableaux on http://127.0.0.1:' + str(port) + ' (backend: ' + service.backend + ')')
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Serve tableaux on localhost, with compiled constraints, candidates and violations kept in memory.')
+    parser.add_argument('--port',type=int,default=default_port,help='port on localhost (default: %(default)s)')
+    parser.add_argument('--backend',choices=['regex','bitmask','automaton','trie'],default='regex',help='as in main.py (default: %(default)s)')
+    parser.add_argument('--max-length',type=int,default=12,help='longest input served, in syllables; longer inputs are refused (default: %(default)s)')
+    parser.add_argument('--max-scorers',type=int,default=8,help='number of constraint sets kept in memory, with their candidates and violations (default: %(default)s)')
+    parser.add_argument('--max-lengths',type=int,default=4,help='number of word lengths whose candidates and violations are kept for each constraint set (default: %(default)s)')
+    parser.add_argument('--max-rows',type=int,default=1000000,help='total number of candidate rows in the finished tableaux kept in memory (default: %(default)s)')
+    parser.add_argument('--mirror',choices=['derive','validate'],help='as in main.py')
+    parser.add_argument('--verbose',action='store_true',help='log every request')
+    arguments = parser.parse_args()
+    if arguments.mirror != None and arguments.backend in ['bitmask','trie']:
+        parser.error('--mirror works with the regex and automaton backends, not with --backend ' + arguments.backend)
+    if arguments.max_lengths < 1:
+        parser.error('--max-lengths must be at least 1')
+    serve(TableauService(arguments.backend,arguments.max_scorers,arguments.max_rows,arguments.mirror,arguments.max_length,arguments.max_lengths),arguments.port,not arguments.verbose)
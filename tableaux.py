@@ -0,0 +1,397 @@
+# This file defines functions that build tableaux (for OTSoft) from inputs, with candidates and violations computed as in representation_generator.py
+# Tableaux can be built serially, or in a pool of worker processes; in both cases they come out in the order of the inputs
+# Tableaux are streamed one at a time from generation through scoring to the OTSoft writer, so the full dataset is never held in memory
+
+import multiprocessing
+import time
+from array import array
+from collections import deque
+from representation_generator import *
+
+
+# Scores the candidates of an input
+# Candidates are generated once per word length, and markedness violations are computed once per surface form (see ConstraintSet)
+# sampler: an optional CandidateSampler (see sampling.py); each input then gets the sampled candidates of its length instead of all of them
+# mirror: None, 'derive' or 'validate' - derive the violations of each candidate from those of its reversed candidate where constraints are mirror images (see mirror.py),
+# and the tableau of an input from the tableau of its reversed input (see derive_tableau and get_tableaux)
+class TableauScorer:
+
+    def __init__(self,constraints,tiers,active_edge,backend='regex',cache_directory=None,profile=None,stress_patterns=None,max_length=None,sampler=None,mirror=None):
+        self.constraints = list(constraints)
+        self.tiers = tiers
+        self.active_edge = active_edge
+        self.backend = backend
+        self.profile = profile
+        self.stress_patterns = stress_patterns                    # optional, shared between scorers: word length -> stress patterns (without active edges)
+        self.max_length = max_length                              # for the trie backend: the longest input, so all lengths are scored in one walk
+        self.scored_lengths = set()                               # for the trie backend: lengths whose candidates are in the markedness table
+        self.sampler = sampler
+        if mirror != None and backend in ['bitmask','trie']:
+            raise TypeError('Mirror images are derived with the regex and automaton backends, not with ' + backend)
+        self.disk_cache = None
+        if cache_directory != None:
+            if backend in ['bitmask','trie']:
+                raise TypeError('The on-disk violation cache works with the regex and automaton backends, not with ' + backend)
+            from violation_cache import ViolationCache
+            self.disk_cache = ViolationCache(cache_directory)
+        engine = 'automaton' if backend in ['automaton','trie'] else 'regex'
+        self.constraint_set = ConstraintSet(self.constraints,disk_cache=self.disk_cache,engine=engine,profile=profile,mirror=mirror)     # Compile the constraints once (fails here on unknown constraint names)
+        # Tableaux can be derived from the tableaux of reversed inputs if every faithfulness constraint has its mirror image in the set,
+        # and the candidates of a length are closed under reversal (all candidates, not a sample)
+        self.derives_tableaux = (mirror != None and sampler == None
+                                 and all([self.constraint_set.mirror_columns[i] != None for i in self.constraint_set.faithfulness]))
+        self.candidates_by_length = {}
+        self.candidate_positions = {}                             # for deriving tableaux: word length -> candidate -> its position in the candidates
+        self.markedness_matrices = {}                             # for the bitmask backend: word length -> markedness violations of all candidates
+        self.markedness_rows = {}                                 # word length -> markedness violations of all candidates (see score_markedness)
+
+    def get_candidates(self,input):
+        if len(input) not in self.candidates_by_length:
+            if self.sampler != None:
+                self.candidates_by_length[len(input)] = self.sampler.candidates(len(input))
+            elif self.stress_patterns == None:
+                self.candidates_by_length[len(input)] = list(get_candidates(input=input,tiers=self.tiers,active_edge=self.active_edge))
+            else:
+                # Derive the candidates from the shared stress patterns, in the order of get_candidates
+                if len(input) not in self.stress_patterns:
+                    self.stress_patterns[len(input)] = list(get_stress_patterns(len(input),self.tiers))
+                patterns = self.stress_patterns[len(input)]
+                if self.active_edge:
+                    self.candidates_by_length[len(input)] = [cand for pattern in patterns for cand in [pattern+'@','@'+pattern]]
+                else:
+                    self.candidates_by_length[len(input)] = patterns
+        return self.candidates_by_length[len(input)]
+
+    # Drop the candidates and violations of a word length (they are computed again when needed)
+    def forget_length(self,word_length):
+        self.candidates_by_length.pop(word_length,None)
+        self.candidate_positions.pop(word_length,None)
+        self.markedness_matrices.pop(word_length,None)
+        self.markedness_rows.pop(word_length,None)
+        self.scored_lengths.discard(word_length)
+        self.constraint_set.clear_cache(word_length)
+
+    # output: a list of violation vectors, one for each candidate of the input (in the order of get_candidates)
+    def score(self,input):
+        cands = self.get_candidates(input)
+        if self.backend == 'bitmask':
+            from bitmask_backend import violation_matrix
+            faithfulness = self.constraint_set.faithfulness
+            matrix = self.get_markedness_matrix(input).copy()
+            matrix[:,faithfulness] = violation_matrix(cands,[self.constraints[i] for i in faithfulness],input,self.profile)
+            return matrix.tolist()
+        self.fill_lengths(input)
+        return [self.constraint_set.count_violations([input,cand]) for cand in cands]
+
+    # The markedness violations are the same for all inputs of a length, and the faithfulness violations depend on the input
+    # (with workers, get_tableaux computes the first in the parent process, and only the second in the workers)
+    # output: one vector of markedness violations per candidate of the input, with 0 in the faithfulness columns
+    # (the vectors are kept for the next inputs of the same length, so they must not be changed)
+    def score_markedness(self,input):
+        if len(input) not in self.markedness_rows:
+            if self.backend == 'bitmask':
+                self.markedness_rows[len(input)] = self.get_markedness_matrix(input).tolist()
+            else:
+                self.fill_lengths(input)
+                self.markedness_rows[len(input)] = [self.constraint_set.markedness_violations([input,cand]) for cand in self.get_candidates(input)]
+        return self.markedness_rows[len(input)]
+
+    # output: the faithfulness violations of the candidates of an input, flattened into one integer array
+    # (candidate by candidate, one value per faithfulness constraint, in the order of constraint_set.faithfulness)
+    def score_faithfulness(self,input):
+        cands = self.get_candidates(input)
+        faithfulness = self.constraint_set.faithfulness
+        if self.backend == 'bitmask':
+            from bitmask_backend import violation_matrix
+            return array('l',violation_matrix(cands,[self.constraints[i] for i in faithfulness],input,self.profile).ravel().tolist())
+        scorers = [self.constraint_set.scorers[i] for i in faithfulness]
+        flat_violations = array('l')
+        for cand in cands:
+            cand_stripped = cand.replace('@','')
+            flat_violations.extend([max(0,scorer(input,cand,cand_stripped)) for scorer in scorers])
+        return flat_violations
+
+    # output: the violations of an input, from its faithfulness violations (as returned by score_faithfulness) and the markedness violations of its length
+    def add_markedness(self,input,flat_violations):
+        faithfulness = self.constraint_set.faithfulness
+        k = len(faithfulness)
+        violations = []
+        for position, markedness in enumerate(self.score_markedness(input)):
+            vector = list(markedness)
+            for i, value in zip(faithfulness,flat_violations[k*position:k*position+k]):
+                vector[i] = value
+            violations.append(vector)
+        return violations
+
+    # For the bitmask backend: the markedness violations of all candidates of the input's length, as a matrix (candidates x constraints)
+    def get_markedness_matrix(self,input):
+        if len(input) not in self.markedness_matrices:
+            import numpy
+            from bitmask_backend import violation_matrix
+            markedness = self.constraint_set.markedness
+            self.markedness_matrices[len(input)] = numpy.zeros((len(self.get_candidates(input)),len(self.constraints)),dtype=numpy.int64)
+            self.markedness_matrices[len(input)][:,markedness] = violation_matrix(self.get_candidates(input),[self.constraints[i] for i in markedness],profile=self.profile)
+        return self.markedness_matrices[len(input)]
+
+    # For the trie backend: score this length and all longer ones (up to max_length) at once, extending the candidates one syllable at a time
+    def fill_lengths(self,input):
+        if self.backend == 'trie' and self.sampler == None and len(input) not in self.scored_lengths:
+            max_length = max(len(input),self.max_length or 0)
+            self.constraint_set.fill_markedness(len(input),max_length,self.tiers,self.active_edge)
+            self.scored_lengths.update(range(len(input),max_length+1))
+
+    # output: the violations of an input, derived from the violations of its reversed input (reversed_violations, as returned by score):
+    # each candidate gets the violations of its reversed candidate, with the columns of mirror-image constraints swapped,
+    # and the markedness columns of constraints without a mirror image in the set are read from the markedness table
+    # (with mirror='validate', the input is also scored directly, and an error is raised if the violations differ)
+    def derive_tableau(self,input,reversed_violations):
+        cands = self.get_candidates(input)
+        if len(input) not in self.candidate_positions:
+            self.candidate_positions[len(input)] = {cand:position for position,cand in enumerate(cands)}
+        positions = self.candidate_positions[len(input)]
+        permutation = self.constraint_set.mirror_permutation
+        unmirrored = self.constraint_set.unmirrored
+        violations = []
+        for cand in cands:
+            mirrored = reversed_violations[positions[cand[::-1]]]
+            vector = [mirrored[i] for i in permutation]
+            if unmirrored:
+                markedness = self.constraint_set.markedness_violations([input,cand])
+                for i in unmirrored:
+                    vector[i] = markedness[i]
+            violations.append(vector)
+        if self.constraint_set.mirror == 'validate':
+            expected = self.score(input)
+            if violations != expected:
+                wrong = [self.constraints[i] for i in range(len(self.constraints)) if any([vector[i] != expected_vector[i] for vector,expected_vector in zip(violations,expected)])]
+                raise TypeError('Violations of ' + input + ' derived from its reversed input differ from direct scoring for: ' + ', '.join(wrong) + ' (see MIRROR in constraints.py)')
+        return violations
+
+
+# With mirror images, for each input: the position of an earlier input that is its reverse (each earlier input serves only one input), or None
+def get_mirror_sources(inputs):
+    earlier = {}
+    sources = []
+    for position, input in enumerate(inputs):
+        source = earlier.pop(input[::-1],None) if input[::-1] != input else None
+        sources.append(source)
+        if source == None:
+            earlier[input] = position
+    return sources
+
+
+# Generate tableaux for a sequence of inputs
+# output: yields one tableau per input, in the order of the inputs, as [input,candidates,violations] (violations: one vector per candidate)
+# workers: number of processes; with more than one, each input is sent to a process pool as a separate task, with at most a few tasks per worker pending.
+# The markedness violations of each word length are computed once, here (see score_markedness), and the workers compute only the faithfulness columns,
+# which they send back as a compact integer array instead of lists of strings (the candidates of each length are regenerated here, in the same order);
+# constraint sets without faithfulness constraints are scored serially, since the markedness violations are all there is to compute
+# timings: an optional dictionary, to which the time spent generating candidates and scoring them is added (with workers, all of it counts as scoring)
+# calls: an optional dictionary, to which the number of inputs whose candidates were generated and scored is added (as timings)
+# cache_directory: an optional directory for the on-disk violation cache (regex and automaton backends only); its hits and misses are added to cache_counts
+# profile: an optional profile (see profiler.py), to which the time of each constraint is added (including the time spent in the workers)
+# stress_patterns: an optional dictionary of stress patterns by word length, shared with other calls
+# With the trie backend and a list of inputs, the candidates of all lengths up to the longest input are scored in one walk over their prefixes
+# (but not with a sampler, since the walk would visit every candidate: sampled candidates are scored one by one with the automaton)
+# sampler: an optional CandidateSampler (see sampling.py), for scoring a sample of the candidates of each length
+# mirror: None, 'derive' or 'validate' - score only one of each pair of mirror-image candidates for the constraints that have their mirror image in the set,
+# and derive the other by permuting the columns (regex and automaton backends; see mirror.py); 'validate' also checks every derived value
+# With a list of inputs (and all candidates, not a sample), the tableau of an input whose reversed input comes earlier (e.g. ooDo after oDoo)
+# is derived from the tableau of that input, faithfulness columns included (see derive_tableau)
+def get_tableaux(inputs,constraints,tiers,active_edge,backend='regex',workers=1,timings=None,cache_directory=None,cache_counts=None,profile=None,stress_patterns=None,sampler=None,mirror=None,calls=None):
+    if timings == None:
+        timings = {}
+    timings.setdefault('candidates',0.0)
+    timings.setdefault('scoring',0.0)
+    if calls == None:
+        calls = {}
+    calls.setdefault('candidates',0)
+    calls.setdefault('scoring',0)
+    if cache_counts == None:
+        cache_counts = {}
+    cache_counts.setdefault('hits',0)
+    cache_counts.setdefault('misses',0)
+
+    max_length = None
+    if backend == 'trie' and isinstance(inputs,list) and inputs:
+        max_length = max([len(input) for input in inputs])
+
+    scorer = TableauScorer(constraints,tiers,active_edge,backend,cache_directory,profile,stress_patterns,max_length,sampler,mirror)
+    sources = get_mirror_sources(inputs) if scorer.derives_tableaux and isinstance(inputs,list) else []
+    needed = set([source for source in sources if source != None])     # inputs whose violations are kept until their reversed input is derived from them
+    kept = {}
+    if workers <= 1 or not scorer.constraint_set.faithfulness:
+        for position, input in enumerate(inputs):
+            stage_start = time.perf_counter()
+            cands = scorer.get_candidates(input)
+            timings['candidates'] += time.perf_counter()-stage_start
+            calls['candidates'] += 1
+            stage_start = time.perf_counter()
+            if sources and sources[position] != None:
+                violations = scorer.derive_tableau(input,kept.pop(sources[position]))
+            else:
+                violations = scorer.score(input)
+            if position in needed:
+                kept[position] = violations
+            timings['scoring'] += time.perf_counter()-stage_start
+            calls['scoring'] += 1
+            yield [input,cands,violations]
+        if scorer.disk_cache != None:
+            scorer.disk_cache.close()
+            cache_counts['hits'] += scorer.disk_cache.hits
+            cache_counts['misses'] += scorer.disk_cache.misses
+        return
+
+    # At most a few tableaux per worker are scored ahead of the consumer, so finished tableaux do not pile up in memory
+    # With mirror images, the inputs whose tableaux are derived from earlier tableaux are not sent to the workers
+    inputs = enumerate(inputs)
+    with multiprocessing.Pool(workers,initializer=start_worker,initargs=(constraints,tiers,active_edge,backend,profile != None,sampler)) as pool:
+        def submit(position,input):
+            if sources and sources[position] != None:
+                pending.append([position,input,None])
+            else:
+                pending.append([position,input,pool.apply_async(score_in_worker,(input,))])
+        pending = deque()
+        for position, input in inputs:
+            submit(position,input)
+            if len(pending) >= workers*4:
+                break
+        while pending:
+            position, input, result = pending.popleft()
+            stage_start = time.perf_counter()
+            if result == None:
+                violations = scorer.derive_tableau(input,kept.pop(sources[position]))
+            else:
+                flat_violations, profile_counts = result.get()
+                if profile != None:
+                    profile.merge(profile_counts)
+                violations = scorer.add_markedness(input,flat_violations)
+            if position in needed:
+                kept[position] = violations
+            timings['scoring'] += time.perf_counter()-stage_start
+            calls['scoring'] += 1
+            next_input = next(inputs,None)
+            if next_input != None:
+                submit(*next_input)
+            yield [input,scorer.get_candidates(input),violations]
+    if scorer.disk_cache != None:
+        scorer.disk_cache.close()
+        cache_counts['hits'] += scorer.disk_cache.hits
+        cache_counts['misses'] += scorer.disk_cache.misses
+
+
+# Each worker process keeps its own scorer (with its own candidates) between inputs, and computes only faithfulness violations
+worker_scorer = None
+
+def start_worker(constraints,tiers,active_edge,backend,profiling=False,sampler=None):
+    global worker_scorer
+    profile = None
+    if profiling:
+        from profiler import Profile
+        profile = Profile()
+    worker_scorer = TableauScorer(constraints,tiers,active_edge,backend,profile=profile,sampler=sampler)
+
+# output: the faithfulness violations of all candidates of the input, flattened into one integer array (see score_faithfulness),
+# and the profile counters of scoring them (None if profiling is off)
+def score_in_worker(input):
+    flat_violations = worker_scorer.score_faithfulness(input)
+    profile_counts = worker_scorer.profile.take() if worker_scorer.profile != None else None
+    return flat_violations, profile_counts
+
+
+# Print tableaux into a text file in OTSoft-compatible format, one tableau at a time
+# tableaux: an iterable of [input,candidates,violations] (as yielded by get_tableaux)
+def write_otsoft(file_name,constraints,tableaux,buffer_size=1<<20):
+    with OTSoftWriter(file_name,constraints,buffer_size) as writer:
+        for input, cands, violation_vectors in tableaux:
+            writer.write(input,cands,violation_vectors)
+
+
+# The two lines with constraint names at the top of an OTSoft file
+def format_otsoft_header(constraints):
+    constraint_line = '\t' + '\t' + ''.join(['\t' + str(constraint) for constraint in constraints]) + '\n'
+    return constraint_line*2
+
+# The lines of a tableau in an OTSoft file: inputs, candidates, and constraint violations
+def format_otsoft_tableau(input,cands,violation_vectors):
+    lines = ['\t' + surface + '\t\t' + '\t'.join([str(i) for i in violations]) + '\n' for surface, violations in zip(cands,violation_vectors)]
+    if lines:
+        lines.insert(0,input + lines[0])    # Repeating the first candidate in another line because of a bug in OTSoft
+    return ''.join(lines)
+
+
+# An OTSoft file that is written one tableau at a time (several can be open at once, see write_theories)
+# Each tableau is formatted as one string and written with a single call, through a large write buffer
+class OTSoftWriter:
+
+    def __init__(self,file_name,constraints,buffer_size=1<<20):
+        self.file = open(file_name,"w",buffering=buffer_size)
+        self.file.write(format_otsoft_header(constraints))
+
+    def write(self,input,cands,violation_vectors):
+        self.file.write(format_otsoft_tableau(input,cands,violation_vectors))
+
+    def close(self):
+        self.file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self,*exception):
+        self.close()
+
+
+# Build and write the tableaux of several theories in one run, one OTSoft file per theory
+# theories: a list of [file name, constraints, active edge (boolean), min input length, max input length]
+# inputs: generated once for all theories (each theory takes the inputs within its lengths, in the same order as get_inputs)
+# Stress patterns are generated once per word length for all theories, and the active-edge variants are derived only for theories with an active edge
+# Theories with the same active-edge setting are scored together, over the union of their constraints, so each input is scored once per setting
+# and each constraint column is computed once, and each theory's file gets its own columns
+# prune: None, 'simple' or 'collective' - remove the harmonically bounded candidates of each theory's tableaux (see harmonic_bounding.py);
+# the number of pruned candidates per input is added to pruning_reports (file name -> list, as in prune_tableaux)
+# writer: the class of the file writers (OTSoftWriter, or BinaryWriter from binary_tableaux.py)
+# sampling: None, or [sample size, seed, stratify, candidates to include] - score a sample of the candidates of each length (see CandidateSampler in sampling.py);
+# all theories with the same active-edge setting get the same sample
+# calls: an optional dictionary, to which the number of tableaux written ('writing') and pruned ('pruning') is added
+# The other arguments are as in get_tableaux
+def write_theories(inputs,theories,tiers,backend='regex',workers=1,timings=None,cache_directory=None,cache_counts=None,profile=None,prune=None,pruning_reports=None,writer=OTSoftWriter,sampling=None,mirror=None,calls=None):
+    if prune != None:
+        from harmonic_bounding import prune_tableau
+        if pruning_reports == None:
+            pruning_reports = {}
+    if timings == None:
+        timings = {}
+    if calls == None:
+        calls = {}
+    stress_patterns = {}
+    for active_edge in [False,True]:
+        group = [theory for theory in theories if theory[2] == active_edge]
+        if not group:
+            continue
+        union = []
+        for file_name, constraints, theory_active_edge, min_length, max_length in group:
+            union.extend([constraint for constraint in constraints if constraint not in union])
+        group_inputs = [input for input in inputs if any([min_length <= len(input) <= max_length for file_name, constraints, theory_active_edge, min_length, max_length in group])]
+        writers = [writer(file_name,constraints) for file_name, constraints, theory_active_edge, min_length, max_length in group]
+        columns = [[union.index(constraint) for constraint in constraints] for file_name, constraints, theory_active_edge, min_length, max_length in group]
+        sampler = None
+        if sampling != None:
+            from sampling import CandidateSampler
+            sampler = CandidateSampler(sampling[0],tiers,active_edge,*sampling[1:])
+        try:
+            for input, cands, violation_vectors in get_tableaux(group_inputs,union,tiers,active_edge,backend,workers,timings,cache_directory,cache_counts,profile,stress_patterns,sampler,mirror,calls):
+                for theory_writer, theory_columns, theory in zip(writers,columns,group):
+                    if theory[3] <= len(input) <= theory[4]:
+                        theory_cands = cands
+                        theory_violations = [[violations[i] for i in theory_columns] for violations in violation_vectors]
+                        if prune != None:
+                            stage_start = time.perf_counter()
+                            theory_cands, theory_violations, number_simply_bounded, number_collectively_bounded = prune_tableau(theory_cands,theory_violations,prune == 'collective')
+                            pruning_reports.setdefault(theory[0],[]).append([input,len(cands),number_simply_bounded,number_collectively_bounded])
+                            timings['pruning'] = timings.get('pruning',0.0) + time.perf_counter()-stage_start
+                            calls['pruning'] = calls.get('pruning',0) + 1
+                        theory_writer.write(input,theory_cands,theory_violations)
+                        calls['writing'] = calls.get('writing',0) + 1
+        finally:
+            for theory_writer in writers:
+                theory_writer.close()
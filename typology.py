@@ -0,0 +1,148 @@
+# This file computes the factorial typology of a constraint set directly from the violation vectors (instead of exporting the tableaux to OTSoft):
+# the set of languages (a winner for every input) that some ranking of the constraints predicts
+# Languages are built incrementally, one tableau at a time, shortest inputs first: each partial language is extended with every possible winner
+# of the next tableau, and the extension is kept only if its ranking conditions are consistent (checked with Recursive Constraint Demotion)
+# Search pruning:
+# - only candidates that are not harmonically bounded (simply or collectively) are possible winners, and candidates with identical violations are one option
+# - the ranking conditions of a winner are computed only against the other possible winners (any ranking that makes it beat them makes it beat the rest)
+# - a tableau with a single possible winner does not branch, and adds no ranking conditions (that winner wins under every ranking)
+# - an inconsistent partial language is dropped at once, so none of its extensions is ever checked
+# - each partial language keeps the ranking found by RCD; if that ranking already satisfies the conditions of a new winner, the extension is consistent
+#   without running RCD again
+# - the ranking conditions of a partial language are stored by constraint, as two bit masks over the conditions (where the constraint prefers the winner,
+#   where it prefers the loser), so each step of RCD is a few integer operations per constraint
+# The consistency checks of each step can run in a pool of worker processes
+
+import multiprocessing
+from harmonic_bounding import simply_bounded, collectively_bounded, erc, satisfies
+
+
+# The possible winners of a tableau
+# output: a list of options, each [violation vector, indices of the candidates with this vector]
+def get_options(violation_vectors):
+    simple = simply_bounded(violation_vectors)
+    survivors = [violations for violations,is_bounded in zip(violation_vectors,simple) if not is_bounded]
+    collective = collectively_bounded(survivors)
+    winners = set([tuple(violations) for violations,is_bounded in zip(survivors,collective) if not is_bounded])
+    options = {}
+    for i in range(len(violation_vectors)):
+        vector = tuple(violation_vectors[i])
+        if vector in winners:
+            options.setdefault(vector,[]).append(i)
+    return [[vector,indices] for vector,indices in options.items()]
+
+# A table of ranking conditions: (number of conditions, for each constraint a mask of the conditions where it prefers the winner,
+# for each constraint a mask of the conditions where it prefers the loser)
+def erc_table(ercs,number_of_constraints):
+    W = [0]*number_of_constraints
+    L = [0]*number_of_constraints
+    for position, (w, l) in enumerate(ercs):
+        for i in range(number_of_constraints):
+            if w >> i & 1:
+                W[i] |= 1 << position
+            elif l >> i & 1:
+                L[i] |= 1 << position
+    return len(ercs), W, L
+
+# The conditions of two tables together
+def join_tables(table,other):
+    count, W, L = table
+    other_count, other_W, other_L = other
+    return count+other_count, [w | other_w << count for w,other_w in zip(W,other_W)], [l | other_l << count for l,other_l in zip(L,other_L)]
+
+# Recursive Constraint Demotion over a table of ranking conditions (see rcd in harmonic_bounding.py)
+# output: a stratified ranking, as a list of bit masks of constraints, or None if the conditions are inconsistent
+def rcd_table(table):
+    count, W, L = table
+    unexplained = (1 << count) - 1
+    unranked = list(range(len(W)))
+    strata = []
+    while unexplained:
+        stratum = [i for i in unranked if not L[i] & unexplained]
+        if not stratum:
+            return None
+        mask = 0
+        for i in stratum:
+            unexplained &= ~W[i]
+            mask |= 1 << i
+        strata.append(mask)
+        unranked = [i for i in unranked if not mask >> i & 1]
+    if unranked:
+        strata.append(sum([1 << i for i in unranked]))
+    return strata
+
+# For one partial language, which options of the next tableau keep its ranking conditions consistent
+# output: a list with a ranking (as returned by rcd_table) for each option, or None if the option makes the language inconsistent
+def check_extensions(arguments):
+    table, strata, option_ercs, option_tables = arguments
+    rankings = []
+    for ercs_of_option, table_of_option in zip(option_ercs,option_tables):
+        if all([satisfies(strata,w,l) for w,l in ercs_of_option]):
+            rankings.append(strata)
+        else:
+            rankings.append(rcd_table(join_tables(table,table_of_option)))
+    return rankings
+
+
+# Compute the factorial typology of a set of tableaux
+# tableaux: an iterable of [input,candidates,violations] (e.g. from get_tableaux), sorted by input length
+# workers: number of processes for the consistency checks (1 = serial)
+# progress: an optional function, called after the last tableau of each input length with (length, number of languages so far)
+# output: a list of languages, each a dictionary with 'winners' (a list of [input, winning candidates], in the order of the tableaux)
+# and 'ranking' (a stratified ranking consistent with the language, as a list of strata of constraint indices)
+def factorial_typology(tableaux,number_of_constraints,workers=1,progress=None):
+    languages = [[[],erc_table([],number_of_constraints),[(1 << number_of_constraints) - 1]]]       # [chosen option for each tableau, table of ranking conditions, a consistent ranking]
+    tableau_options = []        # [input, candidates, options] for each tableau
+    pool = multiprocessing.Pool(workers) if workers > 1 else None
+    try:
+        tableaux = iter(tableaux)
+        tableau = next(tableaux,None)
+        while tableau != None:
+            input, cands, violation_vectors = tableau
+            options = get_options(violation_vectors)
+            tableau_options.append([input,cands,options])
+            if len(options) > 1:
+                option_ercs = [[erc(vector,other) for other,other_indices in options if other != vector] for vector,indices in options]
+                option_tables = [erc_table(ercs,number_of_constraints) for ercs in option_ercs]
+                tasks = [(table,strata,option_ercs,option_tables) for chosen,table,strata in languages]
+                if pool != None:
+                    results = pool.map(check_extensions,tasks,chunksize=max(1,len(tasks)//(workers*4)))
+                else:
+                    results = map(check_extensions,tasks)
+                extended_languages = []
+                for (chosen, table, strata), rankings in zip(languages,results):
+                    for option in range(len(options)):
+                        if rankings[option] != None:
+                            extended_languages.append([chosen+[option],join_tables(table,option_tables[option]),rankings[option]])
+                languages = extended_languages
+            else:
+                for language in languages:
+                    language[0] = language[0] + [0]
+            next_tableau = next(tableaux,None)
+            if progress != None and (next_tableau == None or len(next_tableau[0]) != len(input)):
+                progress(len(input),len(languages))
+            tableau = next_tableau
+    finally:
+        if pool != None:
+            pool.close()
+            pool.join()
+
+    typology = []
+    for chosen, table, strata in languages:
+        winners = []
+        for (input, cands, options), option in zip(tableau_options,chosen):
+            if options:
+                winners.append([input,[cands[i] for i in options[option][1]]])
+        typology.append({'winners':winners, 'ranking':[[i for i in range(number_of_constraints) if stratum >> i & 1] for stratum in strata]})
+    return typology
+
+
+# Write a typology into a text file: for each language, a consistent ranking and the winners of all inputs
+def write_typology(file_name,constraints,typology):
+    with open(file_name,'w') as file:
+        file.write(str(len(typology)) + ' languages\n')
+        for number, language in enumerate(typology):
+            file.write('\nLanguage ' + str(number+1) + '\n')
+            file.write('Ranking: ' + ' >> '.join(['{' + ', '.join([constraints[i] for i in stratum]) + '}' for stratum in language['ranking']]) + '\n')
+            for input, winners in language['winners']:
+                file.write(input + '\t' + ' ~ '.join(winners) + '\n')
@@ -0,0 +1,108 @@
+# This file defines an optional on-disk cache of constraint violations (a SQLite database in a local directory)
+# Each value is keyed by a fingerprint of the constraint definition (its regular expressions, or the code of its violation function) and by the surface form,
+# so after a constraint in CON is added or edited, a rerun only computes the new or changed columns and reads the rest from the cache
+# Only markedness columns are stored; faithfulness (DPS, REP) depends on the input and is as cheap to compute as to look up
+#
+# Usage from the command line:
+# python violation_cache.py stats [directory]                    - number of cached values per constraint fingerprint
+# python violation_cache.py clear [directory]                    - delete all cached values
+# python violation_cache.py invalidate NAME [NAME ...] [--dir D] - delete the cached values of the current definitions of some constraints
+
+import os
+import sys
+import sqlite3
+import hashlib
+
+default_cache_directory = '.violation_cache'
+
+
+# A fingerprint of a constraint: changes whenever the name or the definition of the constraint changes
+def fingerprint(constraint,definition):
+    return hashlib.sha1((constraint + '\n' + definition).encode('utf-8')).hexdigest()
+
+
+class ViolationCache:
+
+    def __init__(self,directory=default_cache_directory):
+        if not os.path.isdir(directory):
+            os.makedirs(directory)
+        self.path = os.path.join(directory,'violations.sqlite')
+        self.connection = sqlite3.connect(self.path,timeout=60)
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('CREATE TABLE IF NOT EXISTS violations (fingerprint TEXT, length INTEGER, form TEXT, value INTEGER, PRIMARY KEY (fingerprint, form)) WITHOUT ROWID')
+        self.connection.commit()
+        self.columns = {}     # (fingerprint, word length) -> {surface form: violations}, loaded on first use
+        self.pending = []     # new values, not yet written to the database
+        self.hits = 0
+        self.misses = 0
+
+    # All cached values of a constraint for surface forms of a given length
+    def get_column(self,constraint_fingerprint,length):
+        key = (constraint_fingerprint,length)
+        if key not in self.columns:
+            rows = self.connection.execute('SELECT form, value FROM violations WHERE fingerprint = ? AND length = ?',key)
+            self.columns[key] = dict(rows)
+        return self.columns[key]
+
+    def add(self,constraint_fingerprint,length,form,value):
+        self.get_column(constraint_fingerprint,length)[form] = value
+        self.pending.append((constraint_fingerprint,length,form,value))
+        if len(self.pending) >= 100000:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            self.connection.executemany('INSERT OR REPLACE INTO violations VALUES (?,?,?,?)',self.pending)
+            self.connection.commit()
+            self.pending = []
+
+    def clear(self):
+        self.pending = []
+        self.columns = {}
+        self.connection.execute('DELETE FROM violations')
+        self.connection.commit()
+        self.connection.execute('VACUUM')
+
+    def invalidate(self,constraint_fingerprints):
+        self.flush()
+        for constraint_fingerprint in constraint_fingerprints:
+            self.connection.execute('DELETE FROM violations WHERE fingerprint = ?',(constraint_fingerprint,))
+            for key in [key for key in self.columns if key[0] == constraint_fingerprint]:
+                del self.columns[key]
+        self.connection.commit()
+
+    # output: a list of (fingerprint, number of cached values)
+    def stats(self):
+        self.flush()
+        return list(self.connection.execute('SELECT fingerprint, COUNT(*) FROM violations GROUP BY fingerprint'))
+
+    def close(self):
+        self.flush()
+        self.connection.close()
+
+
+if __name__ == '__main__':
+    arguments = sys.argv[1:]
+    directory = default_cache_directory
+    if '--dir' in arguments:
+        directory = arguments[arguments.index('--dir')+1]
+        del arguments[arguments.index('--dir'):arguments.index('--dir')+2]
+    if not arguments or arguments[0] not in ['stats','clear','invalidate']:
+        print('Usage: python violation_cache.py stats|clear [directory] | invalidate NAME [NAME ...] [--dir directory]')
+        sys.exit(1)
+    command = arguments[0]
+    if command in ['stats','clear'] and len(arguments) > 1:
+        directory = arguments[1]
+    cache = ViolationCache(directory)
+    if command == 'stats':
+        for constraint_fingerprint, count in cache.stats():
+            print(constraint_fingerprint + '\t' + str(count))
+    elif command == 'clear':
+        cache.clear()
+        print('Cleared the violation cache in ' + directory)
+    else:
+        from representation_generator import ConstraintSet
+        constraint_set = ConstraintSet(arguments[1:])
+        cache.invalidate([fingerprint(constraint,definition) for constraint,definition in zip(constraint_set.constraints,constraint_set.definitions)])
+        print('Invalidated ' + ', '.join(arguments[1:]) + ' in ' + directory)
+    cache.close()